@@ -0,0 +1,106 @@
+"""Learning-curve analytics over columnar attempt history.
+
+A user's attempts on a task are fetched as plain columns and every curve is
+computed with whole-array NumPy operations (cumulative sums for the moving
+windows, accumulated maxima for run lengths), so cost stays linear in the
+number of reps with no per-attempt Python work.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+
+LEARNING_CURVE_CACHE_SIZE = int(os.getenv("LEARNING_CURVE_CACHE_SIZE", "2048"))
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over up to ``window`` values (shorter at the start of the series)."""
+    sums = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def run_lengths(flags: np.ndarray) -> np.ndarray:
+    """Length of the run of consecutive true values ending at each position."""
+    positions = np.arange(len(flags))
+    last_false = np.maximum.accumulate(np.where(flags, -1, positions))
+    return positions - last_false
+
+
+def reps_to_proficiency(proficiency: np.ndarray, consecutive_required: np.ndarray) -> Optional[int]:
+    """1-based rep at which ``consecutive_required`` proficient reps in a row were first reached."""
+    reached = np.flatnonzero(run_lengths(proficiency) >= consecutive_required)
+    return int(reached[0]) + 1 if len(reached) else None
+
+
+def plateau_start(score_average: np.ndarray, window: int, tolerance: float) -> Optional[int]:
+    """1-based rep from which the moving-average score stops improving by more than ``tolerance``.
+
+    Improvement at rep ``i`` is ``avg[i] - avg[i - window]``; the plateau is the
+    final stretch in which every improvement stays within tolerance, and must
+    span at least one window to count.
+    """
+    if len(score_average) < 2 * window:
+        return None
+    improvement = score_average[window:] - score_average[:-window]
+    improving = np.flatnonzero(improvement > tolerance)
+    start = int(improving[-1]) + 1 if len(improving) else 0
+    if len(improvement) - start < window:
+        return None
+    return start + window + 1
+
+
+def learning_curve(
+    time_seconds: np.ndarray,
+    score: np.ndarray,
+    proficiency: np.ndarray,
+    consecutive_required: np.ndarray,
+    window: int,
+    tolerance: float,
+) -> dict:
+    score_average = moving_average(score, window)
+    plateau = plateau_start(score_average, window, tolerance)
+    return {
+        "time_moving_avg": moving_average(time_seconds, window),
+        "score_moving_avg": score_average,
+        "reps_to_proficiency": reps_to_proficiency(proficiency, consecutive_required),
+        "plateau_rep": plateau,
+        "plateau_score": float(score_average[plateau - 1:].mean()) if plateau else None,
+    }
+
+
+class CurveCache:
+    """Bounded LRU of computed curves, each stored with the freshness token it was built for.
+
+    The token comes from the user's ``proficiency_streaks`` rows for the task,
+    which every attempt write (and every rebuild after rescoring) updates, so a
+    cached curve is served only until a new attempt lands, in any worker.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[Hashable, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, token: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != token:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, token: Hashable, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+curve_cache = CurveCache(LEARNING_CURVE_CACHE_SIZE)
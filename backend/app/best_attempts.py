@@ -0,0 +1,114 @@
+"""Maintenance of the ``best_attempts`` table that backs the leaderboards."""
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import upsert_insert
+
+best_table = models.BestAttempt.__table__
+
+
+def best_attempts_upsert(rows: list[dict]):
+    """Build an upsert that replaces stored bests only where the new attempt ranks higher.
+
+    ``rows`` carry ``user_id``, ``task_id``, ``attempt_id``, ``score`` and
+    ``time_seconds`` and must hold at most one row per user and task. The
+    comparison happens inside the database, so concurrent writers for the same
+    user and task cannot overwrite a better result with a worse one.
+    """
+    now = datetime.utcnow()
+    stmt = upsert_insert(best_table).values([{**row, "updated_at": now} for row in rows])
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "task_id"],
+        set_={
+            "attempt_id": excluded.attempt_id,
+            "score": excluded.score,
+            "time_seconds": excluded.time_seconds,
+            "updated_at": excluded.updated_at,
+        },
+        where=or_(
+            excluded.score > best_table.c.score,
+            and_(excluded.score == best_table.c.score, excluded.time_seconds < best_table.c.time_seconds),
+        ),
+    )
+
+
+def _rank_key(row: dict) -> tuple[int, int, int]:
+    return (-row["score"], row["time_seconds"], row["attempt_id"])
+
+
+def record_best_attempts(db: Session, rows: list[dict]) -> None:
+    """Fold a batch of new attempts into ``best_attempts`` with one statement."""
+    best: dict[tuple[int, int], dict] = {}
+    for row in rows:
+        pair = (row["user_id"], row["task_id"])
+        if pair not in best or _rank_key(row) < _rank_key(best[pair]):
+            best[pair] = row
+    if best:
+        db.execute(best_attempts_upsert(list(best.values())))
+
+
+def record_best_attempt(db: Session, attempt: models.Attempt) -> None:
+    record_best_attempts(
+        db,
+        [
+            {
+                "user_id": attempt.user_id,
+                "task_id": attempt.task_id,
+                "attempt_id": attempt.id,
+                "score": attempt.score,
+                "time_seconds": attempt.time_seconds,
+            }
+        ],
+    )
+
+
+def rebuild_best_attempts(db: Session, task_ids: list[int] | None = None) -> None:
+    """Recompute best attempts from the raw attempt history.
+
+    Used to backfill existing databases and after bulk rescoring; the normal
+    write path keeps the table current incrementally.
+    """
+    ranked = select(
+        models.Attempt.user_id,
+        models.Attempt.task_id,
+        models.Attempt.id.label("attempt_id"),
+        models.Attempt.score,
+        models.Attempt.time_seconds,
+        func.row_number()
+        .over(
+            partition_by=(models.Attempt.user_id, models.Attempt.task_id),
+            order_by=(models.Attempt.score.desc(), models.Attempt.time_seconds.asc(), models.Attempt.id.asc()),
+        )
+        .label("rank"),
+    )
+    clear = delete(best_table)
+    if task_ids is not None:
+        ranked = ranked.where(models.Attempt.task_id.in_(task_ids))
+        clear = clear.where(best_table.c.task_id.in_(task_ids))
+    ranked = ranked.subquery()
+
+    db.execute(clear)
+    db.execute(
+        insert(best_table).from_select(
+            ["user_id", "task_id", "attempt_id", "score", "time_seconds", "updated_at"],
+            select(
+                ranked.c.user_id,
+                ranked.c.task_id,
+                ranked.c.attempt_id,
+                ranked.c.score,
+                ranked.c.time_seconds,
+                func.current_timestamp(),
+            ).where(ranked.c.rank == 1),
+        )
+    )
+
+
+def ensure_best_attempts(db: Session) -> None:
+    """Backfill ``best_attempts`` once for databases that predate the table."""
+    if db.query(models.BestAttempt.id).first() is None and db.query(models.Attempt.id).first() is not None:
+        rebuild_best_attempts(db)
+        db.commit()
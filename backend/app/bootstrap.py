@@ -0,0 +1,113 @@
+"""Prepare the database once per deploy: schema, indexes, seed data and backfills.
+
+Run before starting the API workers:
+
+    python -m app.bootstrap
+
+Concurrent runs serialize on a database advisory lock (a lock file next to the
+database for SQLite), so when several replicas or workers start together only
+one performs DDL and seeding; the rest wait and then find nothing to do.
+
+Rescoring queued by the seed is not run here: it can take as long as the
+attempt history, and the port must bind within the health-check window. The
+API runs it in the background once it is up (see ``app.rescoring``).
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from .db import DATABASE_URL, IS_SQLITE_MEMORY, Base, SessionLocal, engine
+
+# Arbitrary application-wide key for pg_advisory_lock.
+BOOTSTRAP_LOCK_KEY = 0x5375726769  # "Surgi"
+
+
+@contextmanager
+def advisory_lock(key: int, name: str, wait: bool = True):
+    """Hold a lock shared by every process on this database; yields whether it was acquired.
+
+    With ``wait=False`` it yields False at once instead of waiting when
+    another process holds it.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if wait:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+            elif not conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}):
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+    elif engine.dialect.name == "sqlite" and not IS_SQLITE_MEMORY:
+        try:
+            import fcntl
+        except ImportError:  # Windows dev machines; no concurrent workers to guard there.
+            yield True
+            return
+        lock_path = DATABASE_URL.replace("sqlite:///", "", 1) + f".{name}.lock"
+        with open(lock_path, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield True
+
+
+def bootstrap_lock():
+    return advisory_lock(BOOTSTRAP_LOCK_KEY, "bootstrap")
+
+
+def bootstrap() -> dict[str, float]:
+    """Run every bootstrap step under the lock; returns seconds spent per step."""
+    from . import models  # noqa: F401  (registers the tables on Base.metadata)
+    from . import seed
+    from .best_attempts import ensure_best_attempts
+    from .migrations import create_missing_indexes
+    from .sketches import ensure_sketches
+    from .streaks import ensure_streaks
+    from .team_stats import ensure_team_stats
+
+    timings: dict[str, float] = {}
+
+    def step(name, func):
+        start = time.perf_counter()
+        func()
+        timings[name] = time.perf_counter() - start
+
+    def backfill():
+        db = SessionLocal()
+        try:
+            ensure_best_attempts(db)
+            ensure_streaks(db)
+            ensure_team_stats(db)
+            ensure_sketches(db)
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    with bootstrap_lock():
+        timings["lock_wait"] = time.perf_counter() - start
+        step("create_schema", lambda: Base.metadata.create_all(bind=engine))
+        step("create_indexes", create_missing_indexes)
+        step("seed", seed.seed)
+        step("backfill", backfill)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def format_timings(timings: dict[str, float]) -> str:
+    return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items())
+
+
+if __name__ == "__main__":
+    print(f"Bootstrap complete ({format_timings(bootstrap())}) pid={os.getpid()}")
@@ -0,0 +1,109 @@
+"""In-process cache of the task/standard/error-type catalog.
+
+The catalog only changes when ``seed.seed()`` runs (or an admin edits it), so
+each worker loads it once, keeps the JSON responses pre-serialized and tags
+them with strong ETags. Call ``catalog.invalidate()`` after any catalog write.
+"""
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+
+from . import models, schemas
+from .db import SessionLocal
+from .utils import etag_matches
+
+_tasks_adapter = TypeAdapter(list[schemas.TaskOut])
+_task_adapter = TypeAdapter(schemas.TaskOut)
+_standards_adapter = TypeAdapter(list[schemas.TaskStandardOut])
+_error_types_adapter = TypeAdapter(list[schemas.ErrorTypeOut])
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_body(cls, body: bytes) -> "CachedBody":
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+@dataclass
+class CatalogSnapshot:
+    version: int
+    tasks: CachedBody
+    error_types: CachedBody
+    task_by_slug: dict[str, CachedBody] = field(default_factory=dict)
+    standards_by_task_id: dict[int, CachedBody] = field(default_factory=dict)
+
+
+class Catalog:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._load(self._version)
+            return self._snapshot
+
+    @staticmethod
+    def _load(version: int) -> CatalogSnapshot:
+        db = SessionLocal()
+        try:
+            tasks = db.query(models.Task).options(selectinload(models.Task.standards)).order_by(models.Task.id).all()
+            error_types = db.query(models.ErrorType).order_by(models.ErrorType.id).all()
+            task_outs = [schemas.TaskOut.model_validate(task, from_attributes=True) for task in tasks]
+            return CatalogSnapshot(
+                version=version,
+                tasks=CachedBody.from_body(_tasks_adapter.dump_json(task_outs)),
+                error_types=CachedBody.from_body(
+                    _error_types_adapter.dump_json(
+                        [schemas.ErrorTypeOut.model_validate(et, from_attributes=True) for et in error_types]
+                    )
+                ),
+                task_by_slug={
+                    out.slug: CachedBody.from_body(_task_adapter.dump_json(out)) for out in task_outs
+                },
+                standards_by_task_id={
+                    task.id: CachedBody.from_body(
+                        _standards_adapter.dump_json(
+                            [schemas.TaskStandardOut.model_validate(st, from_attributes=True) for st in task.standards]
+                        )
+                    )
+                    for task in tasks
+                },
+            )
+        finally:
+            db.close()
+
+
+catalog = Catalog()
+
+
+def cached_response(request: Request, cached: CachedBody) -> Response:
+    """Serve a pre-serialized body, or 304 when the client already holds it."""
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
@@ -1,28 +1,206 @@
 import os
+import threading
+import time
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./surgitrack.db")
 
+# Pool sizing applies per process; the async and sync engines each get a pool.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Applied to every SQLite connection. WAL lets readers proceed while a writer
+# commits, and busy_timeout makes concurrent writers wait instead of failing.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, so 64 MiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_SQLITE_MEMORY = IS_SQLITE and DATABASE_URL.endswith(":memory:")
+
 # Ensure SQLite target directory exists when using file-based SQLite (e.g., /data/surgitrack.db).
-if DATABASE_URL.startswith("sqlite") and not DATABASE_URL.endswith(":memory:"):
+if IS_SQLITE and not IS_SQLITE_MEMORY:
     sqlite_path = DATABASE_URL.replace("sqlite:///", "", 1)
     sqlite_dir = os.path.dirname(sqlite_path) or "."
     if sqlite_dir and not os.path.exists(sqlite_dir):
         os.makedirs(sqlite_dir, exist_ok=True)
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+
+class PoolWaitStats:
+    """Running totals of how long callers waited for a free pooled connection."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, waited: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += waited
+            if waited > self.max_wait_seconds:
+                self.max_wait_seconds = waited
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "total_wait_seconds": round(self.total_wait_seconds, 6),
+                "mean_wait_seconds": round(self.total_wait_seconds / self.checkouts, 6) if self.checkouts else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+
+
+class _TimedCheckout:
+    """Mixin timing how long ``Pool._do_get`` blocks waiting for a free connection.
+
+    Opening a new connection (first use or overflow) happens inside
+    ``_do_get`` too; that time is measured separately and left out, so the
+    stats show pool contention rather than connect latency.
+
+    These are private SQLAlchemy methods with no public event at the start of
+    the wait; requirements.txt pins the minor version and
+    ``tests/test_db_pool.py`` checks they still exist.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        record = super()._create_connection()
+        record._connect_seconds = time.perf_counter() - start
+        return record
+
+    def _do_get(self):
+        start = time.perf_counter()
+        record = super()._do_get()
+        # QueuePool retries by calling _do_get again; count the checkout once.
+        if not getattr(record, "_wait_recorded", False):
+            connect_seconds = record.__dict__.pop("_connect_seconds", 0.0)
+            self.wait_stats.record(max(time.perf_counter() - start - connect_seconds, 0.0))
+            record._wait_recorded = True
+        return record
+
+    def _do_return_conn(self, record) -> None:
+        record._wait_recorded = False
+        super()._do_return_conn(record)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Keyword arguments for ``create_engine``/``create_async_engine`` from the env settings."""
+    options: dict = {}
+    if url.startswith("sqlite") and url.endswith(":memory:"):
+        # In-memory databases live in a single connection; keep SQLAlchemy's default pool.
+        return {"connect_args": {} if is_async else {"check_same_thread": False}}
+    if url.startswith("sqlite") and not is_async:
+        options["connect_args"] = {"check_same_thread": False}
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if IS_SQLITE_MEMORY and name in ("journal_mode", "mmap_size"):
+            continue
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (asyncpg / aiosqlite)."""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+# Async mode for the hot request paths; shares the database with ``engine``.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+def pool_status() -> dict:
+    """Pool occupancy and checkout wait times for both engines, for sizing DB_POOL_*."""
+    status = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        entry = {"pool": pool.status()}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                checked_in=pool.checkedin(),
+            )
+        if isinstance(pool, _TimedCheckout):
+            entry["wait"] = pool.wait_stats.snapshot()
+        status[name] = entry
+    return status
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def upsert_insert(table):
+    """Return an INSERT for ``table`` that supports ``on_conflict_do_update`` on the active dialect."""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
@@ -0,0 +1,239 @@
+"""Streaming export of the attempt history for research.
+
+Rows come from a server-side cursor (``stream_results``/``yield_per``), one
+partition of ``EXPORT_CHUNK_ROWS`` at a time, and each partition is encoded and
+handed to the response before the next is fetched, so memory stays flat
+however large the history is. Error types are pivoted in the database into
+one count column per severity.
+
+CSV and NDJSON need nothing extra; Parquet and Arrow IPC need ``pyarrow``.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import case, func, select
+
+from . import models
+from .db import SessionLocal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+SEVERITIES = ("minor", "major", "critical")
+
+# Column name -> arrow type name, in output order.
+COLUMNS = {
+    "attempt_id": "int64",
+    "user_id": "int64",
+    "user_email": "string",
+    "task_id": "int64",
+    "task_slug": "string",
+    "standard_id": "int64",
+    "standard_level": "string",
+    "started_at": "timestamp",
+    "ended_at": "timestamp",
+    "created_at": "timestamp",
+    "time_seconds": "int64",
+    "score": "int64",
+    "proficiency": "bool",
+    **{f"{severity}_errors": "int64" for severity in SEVERITIES},
+    "error_count": "int64",
+}
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def export_query(
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    team_id: Optional[int] = None,
+):
+    filters = []
+    if task_id is not None:
+        filters.append(models.Attempt.task_id == task_id)
+    if since is not None:
+        filters.append(models.Attempt.created_at >= since)
+    if until is not None:
+        filters.append(models.Attempt.created_at < until)
+    if team_id is not None:
+        filters.append(
+            models.Attempt.user_id.in_(
+                select(models.TeamMembership.user_id).where(models.TeamMembership.team_id == team_id)
+            )
+        )
+
+    error_counts = (
+        select(
+            models.AttemptError.attempt_id,
+            *[
+                func.sum(case((models.ErrorType.severity == severity, 1), else_=0)).label(f"{severity}_errors")
+                for severity in SEVERITIES
+            ],
+            func.count().label("error_count"),
+        )
+        .join(models.ErrorType, models.ErrorType.id == models.AttemptError.error_type_id)
+        .group_by(models.AttemptError.attempt_id)
+    )
+    if filters:
+        error_counts = error_counts.where(models.AttemptError.attempt_id.in_(select(models.Attempt.id).where(*filters)))
+    error_counts = error_counts.subquery()
+
+    return (
+        select(
+            models.Attempt.id.label("attempt_id"),
+            models.Attempt.user_id,
+            models.User.email.label("user_email"),
+            models.Attempt.task_id,
+            models.Task.slug.label("task_slug"),
+            models.Attempt.standard_id,
+            models.TaskStandard.level.label("standard_level"),
+            models.Attempt.started_at,
+            models.Attempt.ended_at,
+            models.Attempt.created_at,
+            models.Attempt.time_seconds,
+            models.Attempt.score,
+            models.Attempt.proficiency,
+            *[
+                func.coalesce(error_counts.c[name], 0).label(name)
+                for name in [f"{severity}_errors" for severity in SEVERITIES] + ["error_count"]
+            ],
+        )
+        .join(models.User, models.User.id == models.Attempt.user_id)
+        .join(models.Task, models.Task.id == models.Attempt.task_id)
+        .outerjoin(models.TaskStandard, models.TaskStandard.id == models.Attempt.standard_id)
+        .outerjoin(error_counts, error_counts.c.attempt_id == models.Attempt.id)
+        .where(*filters)
+        .order_by(models.Attempt.id)
+    )
+
+
+def iter_partitions(query, chunk_size: int = EXPORT_CHUNK_ROWS) -> Iterator[list[tuple]]:
+    """Yield lists of row tuples from a server-side cursor on a dedicated session."""
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        db.close()
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_chunks(partitions: Iterator[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in partitions:
+        writer.writerows([_isoformat(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(partitions: Iterator[list[tuple]]) -> Iterator[bytes]:
+    names = list(COLUMNS)
+    for rows in partitions:
+        yield "".join(json.dumps(dict(zip(names, row)), default=_isoformat) + "\n" for row in rows).encode()
+
+
+class _ChunkSink:
+    """Write-only file for pyarrow writers that hands back what was written since the last drain.
+
+    ``tell`` keeps counting across drains, since the Parquet footer records
+    absolute offsets.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema():
+    types = {
+        "int64": pa.int64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+        "bool": pa.bool_(),
+    }
+    return pa.schema([(name, types[type_name]) for name, type_name in COLUMNS.items()])
+
+
+def arrow_chunks(partitions: Iterator[list[tuple]], fmt: str) -> Iterator[bytes]:
+    """Encode each partition as one Parquet row group or one Arrow IPC record batch."""
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in partitions:
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            )
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(fmt: str, query, chunk_size: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    partitions = iter_partitions(query, chunk_size)
+    if fmt == "csv":
+        return csv_chunks(partitions)
+    if fmt == "ndjson":
+        return ndjson_chunks(partitions)
+    return arrow_chunks(partitions, fmt)
@@ -0,0 +1,285 @@
+"""Resident ResNet-18 inference with dynamic micro-batching.
+
+The model is loaded and warmed up once per worker process. Requests queue
+single images; a batcher task drains the queue into batches of up to
+``INFERENCE_MAX_BATCH_SIZE`` images, waiting at most ``INFERENCE_MAX_WAIT_MS``
+after the first image for more to arrive. Each batch runs as one forward pass
+on a dedicated inference thread, so throughput grows with load while a lone
+request waits no longer than the wait window.
+
+torch/torchvision are optional (``requirements-inference.txt``); without them
+the service reports itself unavailable and the API answers 503.
+"""
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+try:
+    import torch
+    import torchvision
+    from PIL import Image
+    from torchvision import transforms
+except ImportError:  # pragma: no cover - depends on the optional inference extras
+    torch = None
+
+INFERENCE_ON_STARTUP = os.getenv("INFERENCE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "256"))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))  # 0 = torch default
+INFERENCE_TOP_K = int(os.getenv("INFERENCE_TOP_K", "5"))
+# CPU execution mode; `python medical_image_analysis.py --benchmark` compares them.
+# The server supports the modes that need neither calibration data nor extra
+# packages; the CLI's others (shared variable) fall back to eager here.
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "eager")
+INFERENCE_MODES = ("eager", "channels_last", "torchscript", "int8-dynamic")
+# Path to a ResNet-18 state_dict, for hosts that cannot download the torchvision weights.
+INFERENCE_WEIGHTS = os.getenv("INFERENCE_WEIGHTS")
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+
+INPUT_SIZE = 224
+
+
+def inference_available() -> bool:
+    return torch is not None
+
+
+def supported_mode(mode: str) -> str:
+    """``mode`` if the server can run it, otherwise ``eager`` with a warning, so startup never fails on it."""
+    if mode in INFERENCE_MODES:
+        return mode
+    print(
+        f"Warning: INFERENCE_MODE {mode!r} is CLI-only; the server supports {', '.join(INFERENCE_MODES)}. "
+        "Using eager.",
+        flush=True,
+    )
+    return "eager"
+
+
+def class_names() -> list[str]:
+    return torchvision.models.ResNet18_Weights.DEFAULT.meta["categories"]
+
+
+class ChannelsLastModel:
+    """A model converted to channels_last that converts its inputs to match."""
+
+    def __init__(self, model) -> None:
+        self.model = model.to(memory_format=torch.channels_last)
+
+    def __call__(self, inputs):
+        return self.model(inputs.contiguous(memory_format=torch.channels_last))
+
+
+def optimize_model(model, mode: str = INFERENCE_MODE):
+    """Prepare ``model`` for ``mode``, returning a callable from an NCHW batch to logits.
+
+    Mirrors ``medical_image_analysis.optimize_model`` for the modes the server
+    supports. It is not shared because the API image ships only ``app/``, and
+    the CLI's other modes need calibration images, compile time or
+    onnxruntime, which a serving process should not depend on.
+    """
+    if mode == "eager":
+        return model
+    if mode == "channels_last":
+        return ChannelsLastModel(model)
+    if mode == "torchscript":
+        with torch.no_grad():
+            traced = torch.jit.trace(model, torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE))
+            return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    if mode == "int8-dynamic":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    raise ValueError(f"Unsupported INFERENCE_MODE {mode!r}; choose from {', '.join(INFERENCE_MODES)}")
+
+
+def load_model(threads: int = INFERENCE_THREADS, mode: str = INFERENCE_MODE):
+    """ResNet-18 in eval mode, same weights as ``medical_image_analysis.py``, prepared for ``mode``."""
+    if threads:
+        torch.set_num_threads(threads)
+    if INFERENCE_WEIGHTS:
+        model = torchvision.models.resnet18()
+        model.load_state_dict(torch.load(INFERENCE_WEIGHTS, map_location="cpu"))
+    else:
+        model = torchvision.models.resnet18(weights=torchvision.models.ResNet18_Weights.DEFAULT)
+    model.eval()
+    return optimize_model(model, mode)
+
+
+_transform = None
+
+
+def preprocess_frame(image) -> np.ndarray:
+    """PIL image to a float32 CHW array (Resize 224 + ToTensor, as the CLI does)."""
+    global _transform
+    if _transform is None:
+        _transform = transforms.Compose([transforms.Resize((INPUT_SIZE, INPUT_SIZE)), transforms.ToTensor()])
+    return _transform(image.convert("RGB")).numpy()
+
+
+def preprocess_image(data: bytes) -> np.ndarray:
+    """Decode image bytes into a float32 CHW array."""
+    with Image.open(io.BytesIO(data)) as image:
+        return preprocess_frame(image)
+
+
+def predict_batch(model, batch: np.ndarray, top_k: int = INFERENCE_TOP_K) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(probabilities, class_indices)`` of the top ``top_k`` classes per image."""
+    with torch.no_grad():
+        probabilities = torch.softmax(model(torch.from_numpy(batch)), dim=1)
+        values, indices = probabilities.topk(top_k, dim=1)
+    return values.numpy(), indices.numpy()
+
+
+class InferenceUnavailable(Exception):
+    pass
+
+
+class InferenceOverloaded(Exception):
+    pass
+
+
+class InferenceService:
+    """Owns the model and the micro-batching loop for one worker process."""
+
+    def __init__(
+        self,
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS,
+        max_queue: int = INFERENCE_MAX_QUEUE,
+        top_k: int = INFERENCE_TOP_K,
+        mode: str = INFERENCE_MODE,
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.top_k = top_k
+        self.mode = supported_mode(mode)
+        self.model = None
+        self.labels: list[str] = []
+        self.load_seconds: Optional[float] = None
+        self.batches = 0
+        self.images = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        # One thread runs forward passes; torch parallelises inside each batch.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    @property
+    def ready(self) -> bool:
+        return self._batcher is not None and not self._batcher.done()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        model = load_model(mode=self.mode)
+        # Warm-up pays for lazy kernel selection and allocator growth before the first request.
+        predict_batch(model, np.zeros((self.max_batch_size, 3, INPUT_SIZE, INPUT_SIZE), dtype=np.float32), self.top_k)
+        self.model = model
+        self.labels = class_names()
+        self.load_seconds = time.perf_counter() - start
+
+    async def start(self) -> None:
+        """Load and warm the model, then start the batcher on the running loop."""
+        if not inference_available():
+            raise InferenceUnavailable("Install requirements-inference.txt to enable image analysis")
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.ready:
+                return
+            loop = asyncio.get_running_loop()
+            if self.model is None:
+                await loop.run_in_executor(self._executor, self._load)
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._batcher = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        self._batcher = None
+        self._queue = None
+        self._start_lock = None
+
+    async def classify(self, image: np.ndarray) -> tuple[list[dict], int]:
+        """Queue one preprocessed image; returns its predictions and the size of the batch it ran in."""
+        if not self.ready:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((image, future))
+        except asyncio.QueueFull:
+            raise InferenceOverloaded("Inference queue is full")
+        return await future
+
+    async def _next_batch(self) -> list[tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            # Callers that gave up (client disconnects) do not cost a forward pass.
+            batch = [(image, future) for image, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                probabilities, indices = await loop.run_in_executor(
+                    self._executor, predict_batch, self.model, np.stack([image for image, _ in batch]), self.top_k
+                )
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            for (_, future), probs, idxs in zip(batch, probabilities, indices):
+                if not future.done():
+                    predictions = [
+                        {"class_index": int(i), "label": self.labels[i], "probability": round(float(p), 6)}
+                        for p, i in zip(probs, idxs)
+                    ]
+                    future.set_result((predictions, len(batch)))
+
+    def status(self) -> dict:
+        return {
+            "available": inference_available(),
+            "ready": self.ready,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "queue_depth": self.queue_depth(),
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch_size": round(self.images / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "mode": self.mode,
+        }
+
+
+inference_service = InferenceService()
@@ -0,0 +1,185 @@
+"""Analysis job queue kept in the application database, so no broker is needed.
+
+Workers claim with one ``UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP
+LOCKED) RETURNING id``. On Postgres, SKIP LOCKED lets concurrent workers pass
+over rows another worker is claiming instead of queueing behind it. SQLite
+ignores the locking clause but serialises writers, so the single UPDATE is
+atomic there as well.
+
+A job whose worker died (OOM, SIGKILL) never reaches ``fail_job``; its lease
+expires and it is reclaimed, counting as another attempt, until
+``max_attempts`` is spent and it is marked failed.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import upsert_insert
+
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3"))
+ANALYSIS_RETRY_BACKOFF_SECONDS = float(os.getenv("ANALYSIS_RETRY_BACKOFF_SECONDS", "30"))
+# A running job not finished within the lease is assumed lost (worker killed) and reclaimed.
+ANALYSIS_LEASE_SECONDS = float(os.getenv("ANALYSIS_LEASE_SECONDS", "900"))
+# Cap on jobs running at once across all workers and hosts; 0 means no cap.
+ANALYSIS_MAX_RUNNING = int(os.getenv("ANALYSIS_MAX_RUNNING", "0"))
+# Arbitrary key for the pg_advisory_xact_lock that serialises capped claims.
+ANALYSIS_CLAIM_LOCK_KEY = 0x416E616C79  # "Analy"
+
+
+def new_job(attempt_id: int, video_id: int) -> models.AnalysisJob:
+    return models.AnalysisJob(
+        attempt_id=attempt_id,
+        video_id=video_id,
+        status="queued",
+        attempts=0,
+        max_attempts=ANALYSIS_MAX_ATTEMPTS,
+        run_after=datetime.utcnow(),
+    )
+
+
+def _lease_expired(now: datetime):
+    job = models.AnalysisJob
+    return and_(job.status == "running", job.locked_at < now - timedelta(seconds=ANALYSIS_LEASE_SECONDS))
+
+
+def _claimable(now: datetime):
+    job = models.AnalysisJob
+    return or_(
+        and_(job.status == "queued", job.run_after <= now),
+        and_(_lease_expired(now), job.attempts < job.max_attempts),
+    )
+
+
+def _running_count(now: datetime):
+    job = models.AnalysisJob
+    return (
+        select(func.count())
+        .select_from(job)
+        .where(job.status == "running", job.locked_at >= now - timedelta(seconds=ANALYSIS_LEASE_SECONDS))
+        .scalar_subquery()
+    )
+
+
+def fail_expired_jobs(db: Session, now: Optional[datetime] = None) -> int:
+    """Mark jobs whose lease expired on their last allowed attempt as failed."""
+    job = models.AnalysisJob
+    now = now or datetime.utcnow()
+    result = db.execute(
+        update(job)
+        .where(_lease_expired(now), job.attempts >= job.max_attempts)
+        .values(
+            status="failed",
+            locked_by=None,
+            locked_at=None,
+            last_error="Lease expired: the worker stopped before finishing the job",
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int = 1) -> list[models.AnalysisJob]:
+    """Mark up to ``limit`` due jobs as running for ``worker_id`` and return them.
+
+    With ``ANALYSIS_MAX_RUNNING`` set, the count of running jobs is checked
+    inside the claiming UPDATE, and on Postgres the count and claim run under
+    a transaction-level advisory lock, so concurrent workers cannot overshoot
+    the cap.
+    """
+    job = models.AnalysisJob
+    now = datetime.utcnow()
+    fail_expired_jobs(db, now)
+    conditions = [_claimable(now)]
+    if ANALYSIS_MAX_RUNNING:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ANALYSIS_CLAIM_LOCK_KEY})
+        limit = min(limit, ANALYSIS_MAX_RUNNING - db.scalar(select(_running_count(now))))
+        if limit <= 0:
+            db.commit()
+            return []
+        conditions.append(_running_count(now) + limit <= ANALYSIS_MAX_RUNNING)
+
+    candidates = (
+        select(job.id).where(_claimable(now)).order_by(job.id).limit(limit).with_for_update(skip_locked=True)
+    )
+    claimed = db.scalars(
+        update(job)
+        .where(job.id.in_(candidates), *conditions)
+        .values(status="running", locked_by=worker_id, locked_at=now, attempts=job.attempts + 1, updated_at=now)
+        .returning(job.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    if not claimed:
+        return []
+    return list(db.scalars(select(job).where(job.id.in_(claimed)).order_by(job.id)))
+
+
+def _release(db: Session, job: models.AnalysisJob, worker_id: str, **values) -> bool:
+    """Update ``job`` only while ``worker_id`` still holds it; False if the lease was lost."""
+    result = db.execute(
+        update(models.AnalysisJob)
+        .where(
+            models.AnalysisJob.id == job.id,
+            models.AnalysisJob.status == "running",
+            models.AnalysisJob.locked_by == worker_id,
+        )
+        .values(locked_by=None, locked_at=None, updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def complete_job(
+    db: Session,
+    job: models.AnalysisJob,
+    worker_id: str,
+    frames_analyzed: int,
+    results: dict,
+    mode: Optional[str] = None,
+) -> bool:
+    """Store the analysis and mark the job succeeded, in one transaction."""
+    if not _release(db, job, worker_id, status="succeeded", last_error=None):
+        db.rollback()
+        return False
+    values = {
+        "attempt_id": job.attempt_id,
+        "video_id": job.video_id,
+        "job_id": job.id,
+        "frames_analyzed": frames_analyzed,
+        "mode": mode,
+        "results": results,
+        "created_at": datetime.utcnow(),
+    }
+    stmt = upsert_insert(models.AttemptAnalysis).values(**values)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.AttemptAnalysis.video_id],
+            set_={name: stmt.excluded[name] for name in values if name != "video_id"},
+        )
+    )
+    db.commit()
+    return True
+
+
+def fail_job(db: Session, job: models.AnalysisJob, worker_id: str, error: str) -> bool:
+    """Requeue with exponential backoff, or mark failed once ``max_attempts`` is spent."""
+    if job.attempts >= job.max_attempts:
+        released = _release(db, job, worker_id, status="failed", last_error=error)
+    else:
+        delay = ANALYSIS_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        released = _release(
+            db,
+            job,
+            worker_id,
+            status="queued",
+            last_error=error,
+            run_after=datetime.utcnow() + timedelta(seconds=delay),
+        )
+    db.commit()
+    return released
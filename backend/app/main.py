@@ -1,15 +1,25 @@
 import os
+import time
 
-from fastapi import FastAPI
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from .db import Base, engine
-from .routes import auth, tasks, attempts, error_types, leaderboard
-from . import seed
+from .db import async_engine, pool_status
+from .inference import INFERENCE_ON_STARTUP, inference_available, inference_service
+from .metrics import CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, instrument_engines, registry
+from .rescoring import RESCORE_ON_STARTUP, start_background_rescoring
+from .sketches import sketch_store
+from .routes import admin, analysis, analytics, auth, tasks, teams, attempts, error_types, leaderboard, videos
 
-Base.metadata.create_all(bind=engine)
+# Schema, indexes and seed data are prepared by `python -m app.bootstrap`.
+# Leave this on for single-process dev runs; deployments that bootstrap before
+# starting workers set it to false so workers only import the request path.
+BOOTSTRAP_ON_STARTUP = os.getenv("BOOTSTRAP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
 
 app = FastAPI(title="SurgiTrack API")
+startup_timings: dict[str, float] = {}
 
 # Allow explicit origins (needed when allow_credentials=True).
 default_origins = [
@@ -32,18 +42,74 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS_ENABLED:
+    # Added last so it wraps CORS too and times the whole request.
+    app.add_middleware(MetricsMiddleware)
+    instrument_engines()
+
+app.include_router(auth.router)
+app.include_router(tasks.router)
+app.include_router(attempts.router)
+app.include_router(videos.router)
+app.include_router(error_types.router)
+app.include_router(leaderboard.router)
+app.include_router(teams.router)
+app.include_router(analysis.router)
+app.include_router(analytics.router)
+app.include_router(admin.router)
+
+
+startup_timings["import"] = time.perf_counter() - _import_started
+
+
+@app.on_event("startup")
+def run_bootstrap() -> None:
+    start = time.perf_counter()
+    if BOOTSTRAP_ON_STARTUP:
+        # Ensure demo data exists in SQLite even without shell access.
+        from .bootstrap import bootstrap
 
-app.include_router(auth.router, prefix="/auth", tags=["auth"])
-app.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
-app.include_router(attempts.router, prefix="/attempts", tags=["attempts"])
-app.include_router(error_types.router, prefix="/error-types", tags=["error-types"])
-app.include_router(leaderboard.router, prefix="/leaderboard", tags=["leaderboard"])
+        startup_timings.update({f"bootstrap_{name}": seconds for name, seconds in bootstrap().items()})
+    startup_timings["startup"] = time.perf_counter() - start
+    summary = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in startup_timings.items())
+    print(f"Worker {os.getpid()} ready ({summary})")
+
+
+@app.on_event("startup")
+def start_rescoring() -> None:
+    # Jobs queued by bootstrap can take as long as the attempt history; run them off the startup path.
+    if RESCORE_ON_STARTUP:
+        start_background_rescoring()
+
+
+@app.on_event("startup")
+async def start_inference() -> None:
+    # Load and warm the model before traffic arrives rather than on the first request.
+    if INFERENCE_ON_STARTUP and inference_available():
+        start = time.perf_counter()
+        await inference_service.start()
+        startup_timings["inference"] = time.perf_counter() - start
 
 
 @app.on_event("startup")
-def run_seed() -> None:
-    # Ensure demo data exists in SQLite even without shell access.
-    seed.seed()
+async def start_sketches() -> None:
+    # Percentile sketches live in memory; this loads them and starts the periodic flush.
+    await sketch_store.start()
+
+
+@app.on_event("shutdown")
+async def stop_sketches() -> None:
+    await sketch_store.stop()
+
+
+@app.on_event("shutdown")
+async def stop_inference() -> None:
+    await inference_service.stop()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine() -> None:
+    await async_engine.dispose()
 
 
 @app.get("/")
@@ -54,4 +120,18 @@ def root():
 @app.get("/health")
 def health():
     # Lightweight readiness endpoint for Render health checks.
-    return {"status": "ok"}
+    return {"status": "ok", "startup_ms": {name: round(s * 1000, 1) for name, s in startup_timings.items()}}
+
+
+@app.get("/health/db")
+def health_db():
+    # Pool occupancy and checkout waits, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    return pool_status()
+
+
+if METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        # Per-route latency, status counts and DB time, plus pool and inference gauges.
+        return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,248 @@
+"""Per-process request metrics in the Prometheus text format, served at ``/metrics``.
+
+``MetricsMiddleware`` is a plain ASGI middleware (no per-request task or body
+buffering): it times each request, keeps the status it sent and files both
+under the matched route template, so labels stay bounded. A context variable
+carries a per-request counter that SQLAlchemy cursor events add query counts
+and DB time to, for both engines. Pool and inference gauges are read only when
+scraped.
+
+Metrics are per worker process; with several workers, scrape each one or read
+them as samples.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .db import pool_status
+from .inference import inference_service
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Mutated in place, so updates made in threadpool or greenlet copies of the context still count.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class _RouteSeries:
+    __slots__ = ("buckets", "count", "seconds", "queries", "db_seconds", "statuses")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statuses: dict[int, int] = {}
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._routes: dict[tuple[str, str], _RouteSeries] = {}
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.in_flight = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            series = self._routes.get((method, route))
+            if series is None:
+                series = self._routes[(method, route)] = _RouteSeries()
+            series.buckets[bucket] += 1
+            series.count += 1
+            series.seconds += seconds
+            series.queries += stats.queries
+            series.db_seconds += stats.db_seconds
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+
+    def observe_query(self, seconds: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+
+    def render(self) -> str:
+        with self._lock:
+            routes = [
+                (method, route, list(s.buckets), s.count, s.seconds, s.queries, s.db_seconds, dict(s.statuses))
+                for (method, route), s in sorted(self._routes.items())
+            ]
+            queries, db_seconds, in_flight = self.queries, self.db_seconds, self.in_flight
+
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for method, route, buckets, count, seconds, *_ in routes:
+            labels = f'method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {seconds:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+        lines += ["# HELP http_responses_total Responses by route and status.", "# TYPE http_responses_total counter"]
+        for method, route, *_, statuses in routes:
+            for status, count in sorted(statuses.items()):
+                lines.append(
+                    f'http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}'
+                )
+
+        lines += [
+            "# HELP http_request_db_queries_total Database queries issued while serving each route.",
+            "# TYPE http_request_db_queries_total counter",
+        ]
+        for method, route, _, _, _, route_queries, _, _ in routes:
+            lines.append(f'http_request_db_queries_total{{method="{method}",route="{_escape(route)}"}} {route_queries}')
+        lines += [
+            "# HELP http_request_db_seconds_total Time spent in database queries while serving each route.",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        for method, route, _, _, _, _, route_db_seconds, _ in routes:
+            lines.append(
+                f'http_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {route_db_seconds:.6f}'
+            )
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {in_flight}",
+            "# HELP db_queries_total Database queries issued by this process, inside or outside requests.",
+            "# TYPE db_queries_total counter",
+            f"db_queries_total {queries}",
+            "# HELP db_query_seconds_total Time spent in database queries by this process.",
+            "# TYPE db_query_seconds_total counter",
+            f"db_query_seconds_total {db_seconds:.6f}",
+        ]
+        lines += pool_gauges() + inference_gauges()
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Time every HTTP request and record it under its route template."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = RequestStats()
+        token = current_request.set(stats)
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            registry.in_flight -= 1
+            current_request.reset(token)
+            registry.observe_request(scope["method"], route_template(scope), status, seconds, stats)
+
+
+def route_template(scope) -> str:
+    """The matched route's path template, e.g. ``/teams/{team_id}/summary``.
+
+    Routers declare their prefix on ``APIRouter`` so it is part of this path.
+    """
+    return getattr(scope.get("route"), "path", None) or "<unmatched>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    registry.observe_query(seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+
+
+def instrument_engines() -> None:
+    """Count queries and DB time for every engine in the process (sync and async)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def gauge_lines(name: str, help_text: str, samples: list[tuple[str, float]], kind: str = "gauge") -> list[str]:
+    """Exposition lines for one metric; ``samples`` are ``(label string, value)`` pairs."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{{{labels}}} {value}" if labels else f"{name} {value}" for labels, value in samples]
+    return lines
+
+
+def pool_gauges() -> list[str]:
+    pools = pool_status()
+    lines = []
+    for name, key, help_text, kind in (
+        ("db_pool_size", "size", "Configured pool size.", "gauge"),
+        ("db_pool_checked_out", "checked_out", "Connections currently checked out.", "gauge"),
+        ("db_pool_overflow", "overflow", "Connections open beyond the pool size.", "gauge"),
+    ):
+        samples = [(f'engine="{engine}"', entry[key]) for engine, entry in pools.items() if key in entry]
+        lines += gauge_lines(name, help_text, samples, kind)
+    for name, key, help_text, kind in (
+        ("db_pool_checkouts_total", "checkouts", "Connection checkouts.", "counter"),
+        (
+            "db_pool_wait_seconds_total",
+            "total_wait_seconds",
+            "Time spent waiting for a free pooled connection, excluding connect time.",
+            "counter",
+        ),
+        ("db_pool_wait_seconds_max", "max_wait_seconds", "Longest wait for a free pooled connection.", "gauge"),
+    ):
+        samples = [(f'engine="{engine}"', entry["wait"][key]) for engine, entry in pools.items() if "wait" in entry]
+        lines += gauge_lines(name, help_text, samples, kind)
+    return lines
+
+
+def inference_gauges() -> list[str]:
+    return (
+        gauge_lines("inference_ready", "1 when the model is loaded and batching.", [("", int(inference_service.ready))])
+        + gauge_lines("inference_queue_depth", "Images waiting for a batch.", [("", inference_service.queue_depth())])
+        + gauge_lines("inference_images_total", "Images classified.", [("", inference_service.images)], "counter")
+    )
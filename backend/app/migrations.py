@@ -0,0 +1,72 @@
+"""Create indexes declared on the models that an existing database is missing.
+
+``Base.metadata.create_all`` only builds indexes together with new tables, so
+deployments created before an index was added never get it. This module adds
+them in place. On Postgres it uses ``CREATE INDEX CONCURRENTLY`` so writes to
+``attempts`` keep flowing during the build, and it rebuilds indexes left
+invalid by an interrupted concurrent build. Indexes listed in
+``OBSOLETE_INDEXES`` (replaced by a renamed, wider index) are dropped.
+
+Run with ``python -m app.migrations``.
+"""
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+from .db import Base, engine as default_engine
+
+# Superseded indexes by table; their replacements are declared on the models.
+OBSOLETE_INDEXES = {
+    "best_attempts": ["ix_best_attempts_rank", "ix_best_attempts_task_rank"],
+}
+
+
+def _invalid_postgres_indexes(conn) -> set[str]:
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid"
+        )
+    )
+    return {row[0] for row in rows}
+
+
+def create_missing_indexes(engine: Engine = default_engine, log=print) -> list[str]:
+    """Create every model index absent from the database; return the names built."""
+    is_postgres = engine.dialect.name == "postgresql"
+    inspector = inspect(engine)
+    created = []
+    # CONCURRENTLY cannot run inside a transaction block.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = _invalid_postgres_indexes(conn) if is_postgres else set()
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda ix: ix.name):
+                if index.name in existing and index.name not in invalid:
+                    continue
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                if is_postgres:
+                    if index.name in invalid:
+                        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                    ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+                start = time.perf_counter()
+                conn.execute(text(ddl))
+                log(f"Created index {index.name} on {table.name} in {time.perf_counter() - start:.2f}s")
+                created.append(index.name)
+            # Drop superseded indexes only once their replacements exist.
+            for name in OBSOLETE_INDEXES.get(table.name, []):
+                if name in existing:
+                    concurrently = " CONCURRENTLY" if is_postgres else ""
+                    conn.execute(text(f'DROP INDEX{concurrently} IF EXISTS "{name}"'))
+                    log(f"Dropped obsolete index {name} on {table.name}")
+    return created
+
+
+if __name__ == "__main__":
+    built = create_missing_indexes()
+    print(f"Index migration complete ({len(built)} created)")
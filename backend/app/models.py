@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import relationship
 
@@ -31,7 +31,10 @@ class Team(Base):
 
 class TeamMembership(Base):
     __tablename__ = "team_memberships"
-    __table_args__ = (UniqueConstraint("team_id", "user_id", name="uniq_team_user"),)
+    __table_args__ = (
+        UniqueConstraint("team_id", "user_id", name="uniq_team_user"),
+        Index("ix_team_memberships_user", "user_id", "team_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     team_id = Column(Integer, ForeignKey("teams.id", ondelete="CASCADE"))
@@ -82,6 +85,13 @@ class ErrorType(Base):
 
 class Attempt(Base):
     __tablename__ = "attempts"
+    __table_args__ = (
+        # Keyset pages of a user's history (GET /attempts/me).
+        Index("ix_attempts_user_created", "user_id", "created_at", "id"),
+        # Covers the per-task summary aggregates and best-attempt rebuilds.
+        Index("ix_attempts_user_task", "user_id", "task_id", text("score DESC"), "time_seconds", "proficiency"),
+        Index("ix_attempts_score_time", text("score DESC"), "time_seconds"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -103,6 +113,7 @@ class Attempt(Base):
 
 class AttemptError(Base):
     __tablename__ = "attempt_errors"
+    __table_args__ = (Index("ix_attempt_errors_attempt", "attempt_id", "error_type_id"),)
 
     id = Column(Integer, primary_key=True)
     attempt_id = Column(Integer, ForeignKey("attempts.id", ondelete="CASCADE"))
@@ -121,3 +132,210 @@ class Video(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     attempt = relationship("Attempt", back_populates="videos")
+
+
+class VideoUpload(Base):
+    """A resumable (tus-style) upload in progress; becomes a Video when complete."""
+
+    __tablename__ = "video_uploads"
+
+    id = Column(String(32), primary_key=True)
+    attempt_id = Column(Integer, ForeignKey("attempts.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    filename = Column(String, nullable=False)
+    storage_path = Column(String, nullable=False)
+    upload_length = Column(BigInteger, nullable=False)
+    upload_offset = Column(BigInteger, nullable=False, default=0)
+    sha256 = Column(String(64), nullable=True)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="SET NULL"), nullable=True)
+    # Held by the PATCH currently writing; stale once updated_at is older than the lease.
+    lock_token = Column(String(32), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BestAttempt(Base):
+    """Best attempt per user per task, kept current on every attempt write.
+
+    Ranking follows the leaderboard order: highest score, then fastest time.
+    """
+
+    __tablename__ = "best_attempts"
+    __table_args__ = (UniqueConstraint("user_id", "task_id", name="uniq_best_user_task"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    attempt_id = Column(Integer, ForeignKey("attempts.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Integer, nullable=False)
+    time_seconds = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Leaderboard reads walk these in rank order, including the attempt_id
+# tiebreak, and stop after LIMIT rows without a sort.
+Index(
+    "ix_best_attempts_leaderboard",
+    BestAttempt.score.desc(),
+    BestAttempt.time_seconds.asc(),
+    BestAttempt.attempt_id.asc(),
+)
+Index(
+    "ix_best_attempts_task_leaderboard",
+    BestAttempt.task_id,
+    BestAttempt.score.desc(),
+    BestAttempt.time_seconds.asc(),
+    BestAttempt.attempt_id.asc(),
+)
+
+
+class ProficiencyStreak(Base):
+    """Consecutive proficient attempts per user per standard, kept current on every attempt write.
+
+    ``achieved_at`` is set the first time a run reaches ``consecutive_required``
+    and then kept, so proficiency is a single-row read instead of a history scan.
+    """
+
+    __tablename__ = "proficiency_streaks"
+    __table_args__ = (
+        UniqueConstraint("user_id", "standard_id", name="uniq_streak_user_standard"),
+        Index("ix_proficiency_streaks_user_task", "user_id", "task_id", "achieved_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    standard_id = Column(Integer, ForeignKey("task_standards.id", ondelete="CASCADE"), nullable=False)
+    consecutive_required = Column(Integer, nullable=False, default=1)
+    current_run = Column(Integer, nullable=False, default=0)
+    best_run = Column(Integer, nullable=False, default=0)
+    achieved_at = Column(DateTime, nullable=True)
+    last_attempt_id = Column(Integer, ForeignKey("attempts.id", ondelete="SET NULL"), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TeamTaskStats(Base):
+    """Attempt totals per team per task over its members' history, kept current on every attempt write.
+
+    Membership changes add or subtract the member's history, so team reads
+    never aggregate raw attempts.
+    """
+
+    __tablename__ = "team_task_stats"
+    __table_args__ = (UniqueConstraint("team_id", "task_id", name="uniq_team_task_stats"),)
+
+    id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    proficient_attempts = Column(Integer, nullable=False, default=0)
+    time_seconds_sum = Column(BigInteger, nullable=False, default=0)
+    score_sum = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TeamTaskTime(Base):
+    """Histogram of attempt durations per team per task (one row per distinct second), for medians."""
+
+    __tablename__ = "team_task_times"
+    __table_args__ = (UniqueConstraint("team_id", "task_id", "time_seconds", name="uniq_team_task_time"),)
+
+    id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    time_seconds = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class TaskSketch(Base):
+    """Score histogram and log-bucketed time sketch of every attempt on a standard (see ``app.sketches``)."""
+
+    __tablename__ = "task_sketches"
+    __table_args__ = (UniqueConstraint("standard_id", name="uniq_task_sketch_standard"),)
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False, index=True)
+    standard_id = Column(Integer, ForeignKey("task_standards.id", ondelete="CASCADE"), nullable=False)
+    count = Column(BigInteger, nullable=False, default=0)
+    score_counts = Column(JSON, nullable=False)
+    time_bins = Column(JSON, nullable=False)
+    time_zero_count = Column(BigInteger, nullable=False, default=0)
+    # Set by ``rebuild_sketches``; worker deltas recorded before it are already counted.
+    rebuilt_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RescoreJob(Base):
+    """Bulk rescoring of the attempts logged against ``standard_ids``.
+
+    ``last_attempt_id`` is the keyset cursor committed after every chunk, so an
+    interrupted job resumes where it stopped.
+    """
+
+    __tablename__ = "rescore_jobs"
+
+    id = Column(Integer, primary_key=True)
+    standard_ids = Column(JSON, nullable=False)
+    reason = Column(String, nullable=True)
+    status = Column(String(16), nullable=False, default="pending")
+    last_attempt_id = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    processed = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class SeedState(Base):
+    """Fingerprint of the seed data last applied, so unchanged seeds are skipped."""
+
+    __tablename__ = "seed_state"
+
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AnalysisJob(Base):
+    """Queued frame analysis of one attempt video, claimed by ``python -m app.worker``.
+
+    Status moves queued -> running -> succeeded, or back to queued with a
+    backoff (``run_after``) until ``max_attempts`` is spent, then failed. A
+    running job whose lease (``locked_at``) expires is claimable again while
+    attempts remain, and failed once they are spent.
+    """
+
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        UniqueConstraint("video_id", name="uniq_analysis_job_video"),
+        Index("ix_analysis_jobs_claim", "status", "run_after", "id"),
+        Index("ix_analysis_jobs_attempt", "attempt_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    attempt_id = Column(Integer, ForeignKey("attempts.id", ondelete="CASCADE"), nullable=False)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AttemptAnalysis(Base):
+    """Model output for the frames sampled from an attempt video."""
+
+    __tablename__ = "attempt_analyses"
+
+    id = Column(Integer, primary_key=True)
+    attempt_id = Column(Integer, ForeignKey("attempts.id", ondelete="CASCADE"), nullable=False, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), nullable=False, unique=True)
+    job_id = Column(Integer, ForeignKey("analysis_jobs.id", ondelete="SET NULL"), nullable=True)
+    frames_analyzed = Column(Integer, nullable=False)
+    mode = Column(String, nullable=True)
+    results = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
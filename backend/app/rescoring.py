@@ -0,0 +1,210 @@
+"""Bulk rescoring of stored attempts after their standards (or error severities) change.
+
+Attempts are read in keyset chunks of columnar values (time and error counts
+per severity), scored together with ``scoring.score_attempts``, and only rows
+whose score or proficiency changed are written back, with one executemany
+UPDATE per chunk. The cursor is committed with each chunk, so a job that is
+interrupted resumes where it stopped. Bootstrap only queues jobs; each API
+process starts a background thread that runs them once the server is up (one
+process at a time, under an advisory lock). To run or resume them by hand::
+
+    python -m app.rescoring                  # pending jobs
+    python -m app.rescoring --standard-id 3  # queue and run one now
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .bootstrap import advisory_lock
+from .best_attempts import rebuild_best_attempts
+from .db import SessionLocal
+from .scoring import score_attempts
+from .sketches import rebuild_sketches
+from .streaks import rebuild_streaks
+from .team_stats import rebuild_team_stats
+
+RESCORE_CHUNK_SIZE = 5000
+# Each API process tries to run pending jobs in a background thread after startup.
+RESCORE_ON_STARTUP = os.getenv("RESCORE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Arbitrary application-wide key for pg_try_advisory_lock; distinct from bootstrap's.
+RESCORE_LOCK_KEY = 724_031_902
+SEVERITIES = ("minor", "major", "critical")
+
+
+def queue_rescore(db: Session, standard_ids: list[int], reason: Optional[str] = None) -> models.RescoreJob:
+    job = models.RescoreJob(standard_ids=sorted(set(standard_ids)), reason=reason, status="pending")
+    db.add(job)
+    return job
+
+
+def _standard_limits(db: Session, standard_ids: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted standard ids and a (n, 3) array of target time, max minor and max major errors."""
+    rows = db.execute(
+        select(
+            models.TaskStandard.id,
+            models.TaskStandard.target_time_seconds,
+            func.coalesce(models.TaskStandard.max_minor_errors, 0),
+            func.coalesce(models.TaskStandard.max_major_errors, 0),
+        )
+        .where(models.TaskStandard.id.in_(standard_ids))
+        .order_by(models.TaskStandard.id)
+    ).all()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    limits = np.array([row[1:] for row in rows], dtype=np.int64).reshape(-1, 3)
+    return ids, limits
+
+
+def _rescore_chunk(
+    db: Session, job: models.RescoreJob, std_ids: np.ndarray, limits: np.ndarray, chunk_size: int
+) -> int:
+    """Rescore the next chunk after the job cursor; returns the number of attempts read."""
+    attempt = models.Attempt
+    rows = db.execute(
+        select(attempt.id, attempt.standard_id, attempt.time_seconds, attempt.score, attempt.proficiency)
+        .where(attempt.standard_id.in_(job.standard_ids), attempt.id > job.last_attempt_id)
+        .order_by(attempt.id)
+        .limit(chunk_size)
+    ).all()
+    if not rows:
+        return 0
+    ids = np.array([row.id for row in rows], dtype=np.int64)
+    standard_ids = np.array([row.standard_id for row in rows], dtype=np.int64)
+    time_seconds = np.array([row.time_seconds for row in rows], dtype=np.int64)
+    old_scores = np.array([row.score for row in rows], dtype=np.int64)
+    old_proficiency = np.array([bool(row.proficiency) for row in rows])
+
+    # Error counts per severity for the whole chunk in one grouped query.
+    counts = np.zeros((len(rows), len(SEVERITIES)), dtype=np.int64)
+    error_rows = db.execute(
+        select(models.AttemptError.attempt_id, models.ErrorType.severity, func.count())
+        .join(models.ErrorType, models.ErrorType.id == models.AttemptError.error_type_id)
+        .where(models.AttemptError.attempt_id.in_(ids.tolist()))
+        .group_by(models.AttemptError.attempt_id, models.ErrorType.severity)
+    ).all()
+    for attempt_id, severity, count in error_rows:
+        if severity in SEVERITIES:
+            counts[np.searchsorted(ids, attempt_id), SEVERITIES.index(severity)] = count
+
+    standard_limits = limits[np.searchsorted(std_ids, standard_ids)]
+    scores, proficiency = score_attempts(
+        time_seconds,
+        standard_limits[:, 0],
+        standard_limits[:, 1],
+        standard_limits[:, 2],
+        counts[:, 0],
+        counts[:, 1],
+        counts[:, 2],
+    )
+
+    changed = np.flatnonzero((scores != old_scores) | (proficiency != old_proficiency))
+    if len(changed):
+        db.execute(
+            update(attempt),
+            [{"id": int(ids[i]), "score": int(scores[i]), "proficiency": bool(proficiency[i])} for i in changed],
+        )
+    job.last_attempt_id = int(ids[-1])
+    job.processed += len(rows)
+    job.updated += len(changed)
+    return len(rows)
+
+
+def run_rescore_job(
+    db: Session,
+    job: models.RescoreJob,
+    chunk_size: int = RESCORE_CHUNK_SIZE,
+    log: Optional[Callable[[str], None]] = print,
+) -> None:
+    """Run (or resume) ``job`` to completion, then rebuild the derived tables for its tasks."""
+    start = time.perf_counter()
+    if job.total is None:
+        job.total = db.scalar(
+            select(func.count()).select_from(models.Attempt).where(models.Attempt.standard_id.in_(job.standard_ids))
+        )
+    job.status = "running"
+    db.commit()
+
+    std_ids, limits = _standard_limits(db, job.standard_ids)
+    while _rescore_chunk(db, job, std_ids, limits, chunk_size):
+        db.commit()
+        if log:
+            elapsed = time.perf_counter() - start
+            log(
+                f"Rescore job {job.id}: {job.processed}/{job.total} attempts, {job.updated} changed "
+                f"({job.processed / elapsed:.0f}/s)"
+            )
+
+    # Leaderboard bests, proficiency streaks, team rollups and sketches are derived from scores.
+    task_ids = list(
+        db.scalars(select(models.TaskStandard.task_id).where(models.TaskStandard.id.in_(job.standard_ids)).distinct())
+    )
+    rebuild_best_attempts(db, task_ids)
+    rebuild_streaks(db, task_ids)
+    rebuild_team_stats(db, task_ids)
+    rebuild_sketches(db, task_ids)
+    job.status = "done"
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    if log:
+        log(
+            f"Rescore job {job.id} done: {job.updated} of {job.processed} attempts changed "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+
+def run_pending_rescores(log: Optional[Callable[[str], None]] = print) -> int:
+    """Run every pending or interrupted job; returns how many ran.
+
+    Only one process runs jobs at a time; the others return 0 at once.
+    """
+    with advisory_lock(RESCORE_LOCK_KEY, "rescore", wait=False) as acquired:
+        if not acquired:
+            return 0
+        db = SessionLocal()
+        try:
+            jobs = db.scalars(
+                select(models.RescoreJob)
+                .where(models.RescoreJob.status.in_(("pending", "running")))
+                .order_by(models.RescoreJob.id)
+            ).all()
+            for job in jobs:
+                run_rescore_job(db, job, log=log)
+            return len(jobs)
+        finally:
+            db.close()
+
+
+def _run_in_background() -> None:
+    try:
+        run_pending_rescores()
+    except Exception as exc:  # Progress is committed per chunk; the next start resumes it.
+        print(f"Background rescoring failed: {exc!r}")
+
+
+def start_background_rescoring() -> threading.Thread:
+    """Run pending jobs in a daemon thread so the server keeps serving meanwhile."""
+    thread = threading.Thread(target=_run_in_background, name="rescoring", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore attempts against their current standards.")
+    parser.add_argument("--standard-id", type=int, action="append", help="queue a rescore for this standard")
+    parser.add_argument("--all", action="store_true", help="queue a rescore for every standard")
+    args = parser.parse_args()
+
+    if args.standard_id or args.all:
+        session = SessionLocal()
+        ids = args.standard_id or list(session.scalars(select(models.TaskStandard.id)))
+        queue_rescore(session, ids, reason="manual")
+        session.commit()
+        session.close()
+    print(f"Ran {run_pending_rescores()} rescore job(s)")
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from .. import models
+from ..exports import FORMATS, arrow_available, export_chunks, export_query
+from ..security import get_current_admin
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/exports/attempts")
+def export_attempts(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet|arrow)$"),
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    team_id: Optional[int] = None,
+    admin: models.User = Depends(get_current_admin),
+):
+    """Stream every attempt (filtered by task, ``created_at`` range and team) for research use.
+
+    One row per attempt with per-severity error counts. ``format`` is ``csv``,
+    ``ndjson``, ``parquet`` or ``arrow`` (Arrow IPC stream); the last two need
+    pyarrow on the server.
+    """
+    if fmt in ("parquet", "arrow") and not arrow_available():
+        raise HTTPException(status_code=501, detail=f"{fmt} export needs pyarrow installed on the server")
+    media_type, extension = FORMATS[fmt]
+    return StreamingResponse(
+        export_chunks(fmt, export_query(task_id=task_id, since=since, until=until, team_id=team_id)),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="attempts.{extension}"',
+            "Cache-Control": "no-store",
+        },
+    )
@@ -0,0 +1,58 @@
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+
+from .. import schemas
+from ..inference import (
+    MAX_IMAGE_BYTES,
+    InferenceOverloaded,
+    InferenceUnavailable,
+    inference_service,
+    preprocess_image,
+)
+from ..security import CurrentUser, get_current_user_claims
+from ..storage import too_large
+
+router = APIRouter(prefix="/analysis", tags=["analysis"])
+
+
+@router.post("/image", response_model=schemas.ImageAnalysisOut)
+async def analyze_image(
+    file: UploadFile,
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Classify one image with the resident model.
+
+    Concurrent calls share forward passes: ``batch_size`` reports how many
+    images ran together with this one.
+    """
+    data = await file.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise too_large(MAX_IMAGE_BYTES)
+    try:
+        if not inference_service.ready:
+            await inference_service.start()
+        try:
+            image = await run_in_threadpool(preprocess_image, data)
+        except Exception:
+            raise HTTPException(status_code=400, detail="File is not a readable image")
+        start = time.perf_counter()
+        predictions, batch_size = await inference_service.classify(image)
+    except InferenceUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
+    except InferenceOverloaded as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc), headers={"Retry-After": "1"}
+        )
+    return schemas.ImageAnalysisOut(
+        predictions=predictions,
+        batch_size=batch_size,
+        inference_ms=round((time.perf_counter() - start) * 1000, 2),
+    )
+
+
+@router.get("/status")
+def analysis_status():
+    # Model load time and batching efficiency, for tuning INFERENCE_MAX_* settings.
+    return inference_service.status()
@@ -0,0 +1,110 @@
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..analytics import curve_cache, learning_curve
+from ..db import get_async_db
+from ..security import CurrentUser, get_current_user_claims
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/learning-curve", response_model=schemas.LearningCurveOut)
+async def get_learning_curve(
+    task_id: int,
+    window: int = Query(5, ge=1, le=50),
+    plateau_tolerance: float = Query(2.0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Moving averages, reps to proficiency and plateau for the user's attempts on a task.
+
+    ``window`` is the moving-average length in reps. A plateau starts where the
+    moving-average score stops gaining more than ``plateau_tolerance`` points
+    per window. Results are cached until the user logs another attempt.
+    """
+    if await db.get(models.Task, task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    # The streak rows for this user and task change with every attempt write,
+    # so they make a cheap, indexed freshness check for the cached curve.
+    token = tuple(
+        (
+            await db.execute(
+                select(
+                    func.count(),
+                    func.max(models.ProficiencyStreak.last_attempt_id),
+                    func.max(models.ProficiencyStreak.updated_at),
+                ).where(
+                    models.ProficiencyStreak.user_id == current_user.id,
+                    models.ProficiencyStreak.task_id == task_id,
+                )
+            )
+        ).one()
+    )
+    key = (current_user.id, task_id, window, plateau_tolerance)
+    cached = curve_cache.get(key, token)
+    if cached is not None:
+        return cached
+
+    rows = (
+        await db.execute(
+            select(
+                models.Attempt.created_at,
+                models.Attempt.time_seconds,
+                models.Attempt.score,
+                models.Attempt.proficiency,
+                func.coalesce(models.TaskStandard.consecutive_required, 1),
+            )
+            .join(models.TaskStandard, models.TaskStandard.id == models.Attempt.standard_id)
+            .where(models.Attempt.user_id == current_user.id, models.Attempt.task_id == task_id)
+            .order_by(models.Attempt.created_at, models.Attempt.id)
+        )
+    ).all()
+
+    if rows:
+        created_at, time_seconds, score, proficiency, required = zip(*rows)
+        curve = learning_curve(
+            np.array(time_seconds, dtype=np.float64),
+            np.array(score, dtype=np.float64),
+            np.array(proficiency, dtype=bool),
+            np.array(required, dtype=np.int64),
+            window,
+            plateau_tolerance,
+        )
+        points = [
+            schemas.LearningCurvePoint(
+                rep=rep,
+                created_at=created,
+                time_seconds=seconds,
+                score=points_scored,
+                proficiency=proficient,
+                time_moving_avg=round(float(time_avg), 2),
+                score_moving_avg=round(float(score_avg), 2),
+            )
+            for rep, created, seconds, points_scored, proficient, time_avg, score_avg in zip(
+                range(1, len(rows) + 1),
+                created_at,
+                time_seconds,
+                score,
+                proficiency,
+                curve["time_moving_avg"],
+                curve["score_moving_avg"],
+            )
+        ]
+    else:
+        curve, points = {}, []
+
+    result = schemas.LearningCurveOut(
+        task_id=task_id,
+        attempts=len(rows),
+        window=window,
+        reps_to_proficiency=curve.get("reps_to_proficiency"),
+        plateau_rep=curve.get("plateau_rep"),
+        plateau_score=round(curve["plateau_score"], 2) if curve.get("plateau_score") is not None else None,
+        points=points,
+    )
+    curve_cache.put(key, token, result)
+    return result
@@ -1,49 +1,53 @@
-from collections import Counter
+import base64
+from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
-from sqlalchemy.orm import Session
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from .. import models, schemas
-from ..db import get_db
-from ..security import get_current_user
+from ..best_attempts import record_best_attempt, record_best_attempts
+from ..db import get_async_db
+from ..scoring import score_attempt, score_attempts
+from ..security import CurrentUser, get_current_user_claims
+from ..sketches import sketch_store
+from ..streaks import record_streak, record_streaks
+from ..team_stats import record_team_stat, record_team_stats
 
-router = APIRouter()
+router = APIRouter(prefix="/attempts", tags=["attempts"])
 
+UNKNOWN_ERROR_TYPE = "Unknown error type"
 
-def score_attempt(time_seconds: int, standard: models.TaskStandard, error_types: list[models.ErrorType]):
-    score = 100
-    extra_seconds = max(0, time_seconds - standard.target_time_seconds)
-    score -= min(40, extra_seconds)
 
-    severity_counts = Counter(err.severity for err in error_types)
-    minor_errors = severity_counts.get("minor", 0)
-    major_errors = severity_counts.get("major", 0)
-    critical_errors = severity_counts.get("critical", 0)
+def _error_type_ids(errors: list[schemas.AttemptErrorIn]) -> list[int]:
+    # Duplicate error ids collapse: an error type is counted once per attempt.
+    return list(dict.fromkeys(err.error_type_id for err in errors))
 
-    score -= minor_errors * 5
-    score -= major_errors * 15
 
-    if critical_errors > 0:
-        score = min(score, 60)
-        proficiency = False
-    else:
-        proficiency = (
-            time_seconds <= standard.target_time_seconds
-            and minor_errors <= standard.max_minor_errors
-            and major_errors <= standard.max_major_errors
-        )
-    score = max(score, 0)
-    return score, proficiency
+async def _load_error_types(db: AsyncSession, error_type_ids) -> dict[int, models.ErrorType]:
+    """Error types by id with one query; ids that do not exist are absent from the result."""
+    if not error_type_ids:
+        return {}
+    return {
+        et.id: et for et in await db.scalars(select(models.ErrorType).where(models.ErrorType.id.in_(error_type_ids)))
+    }
+
+
+def _has_unknown_error_type(error_type_ids: list[int], error_types: dict[int, models.ErrorType]) -> bool:
+    return any(error_id not in error_types for error_id in error_type_ids)
 
 
 @router.post("/", response_model=schemas.AttemptOut, status_code=status.HTTP_201_CREATED)
-def create_attempt(
+async def create_attempt(
     payload: schemas.AttemptCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
 ):
-    task = db.query(models.Task).filter(models.Task.id == payload.task_id).first()
-    standard = db.query(models.TaskStandard).filter(models.TaskStandard.id == payload.standard_id).first()
+    task = await db.get(models.Task, payload.task_id)
+    standard = await db.get(models.TaskStandard, payload.standard_id)
     if not task or not standard:
         raise HTTPException(status_code=404, detail="Task or standard not found")
     if standard.task_id != task.id:
@@ -56,14 +60,11 @@ def create_attempt(
 
     time_seconds = int((ended_at - started_at).total_seconds())
 
-    error_type_ids = [err.error_type_id for err in payload.errors]
-    error_types = (
-        db.query(models.ErrorType)
-        .filter(models.ErrorType.id.in_(error_type_ids))
-        .all()
-        if error_type_ids
-        else []
-    )
+    error_type_ids = _error_type_ids(payload.errors)
+    known_error_types = await _load_error_types(db, error_type_ids)
+    if _has_unknown_error_type(error_type_ids, known_error_types):
+        raise HTTPException(status_code=400, detail=UNKNOWN_ERROR_TYPE)
+    error_types = [known_error_types[error_id] for error_id in error_type_ids]
 
     score, proficiency = score_attempt(time_seconds, standard, error_types)
 
@@ -78,13 +79,18 @@ def create_attempt(
         proficiency=proficiency,
     )
     db.add(attempt)
-    db.flush()
+    await db.flush()
 
     for err in error_types:
         db.add(models.AttemptError(attempt_id=attempt.id, error_type_id=err.id))
+    await db.run_sync(record_best_attempt, attempt)
+    await db.run_sync(record_streak, attempt, standard.consecutive_required)
+    await db.run_sync(record_team_stat, attempt)
 
-    db.commit()
-    db.refresh(attempt)
+    await db.commit()
+    sketch_store.record(
+        attempt.task_id, attempt.standard_id, attempt.score, attempt.time_seconds, attempt.created_at
+    )
     return schemas.AttemptOut(
         id=attempt.id,
         task_id=attempt.task_id,
@@ -95,93 +101,294 @@ def create_attempt(
         score=attempt.score,
         proficiency=attempt.proficiency,
         errors=[schemas.ErrorTypeOut.model_validate(err, from_attributes=True) for err in error_types],
+        percentile_rank=sketch_store.score_rank(attempt.task_id, attempt.standard_id, attempt.score),
     )
 
 
-@router.get("/me", response_model=list[schemas.AttemptOut])
-def list_my_attempts(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+@router.post("/batch", response_model=schemas.AttemptBatchOut, status_code=status.HTTP_201_CREATED)
+async def create_attempts_batch(
+    payload: schemas.AttemptBatchCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
 ):
-    attempts = db.query(models.Attempt).filter(models.Attempt.user_id == current_user.id).all()
-    results = []
-    for attempt in attempts:
-        errors = [schemas.ErrorTypeOut.model_validate(ae.error_type, from_attributes=True) for ae in attempt.errors]
-        results.append(
-            schemas.AttemptOut(
-                id=attempt.id,
-                task_id=attempt.task_id,
-                standard_id=attempt.standard_id,
-                started_at=attempt.started_at,
-                ended_at=attempt.ended_at,
-                time_seconds=attempt.time_seconds,
-                score=attempt.score,
-                proficiency=attempt.proficiency,
-                errors=errors,
-            )
+    """Log a whole session of attempts in one request.
+
+    Ids are validated with one set-based query per table, all valid rows are
+    scored together with ``score_attempts`` and inserted with bulk statements
+    in a single transaction. Invalid items are skipped and reported by index.
+    """
+    items = payload.attempts
+    task_ids = {item.task_id for item in items}
+    standard_ids = {item.standard_id for item in items}
+    error_type_ids = {err.error_type_id for item in items for err in item.errors}
+
+    known_task_ids = set((await db.scalars(select(models.Task.id).where(models.Task.id.in_(task_ids)))).all())
+    standard_rows = await db.execute(
+        select(
+            models.TaskStandard.id,
+            models.TaskStandard.task_id,
+            models.TaskStandard.target_time_seconds,
+            models.TaskStandard.max_minor_errors,
+            models.TaskStandard.max_major_errors,
+            models.TaskStandard.consecutive_required,
+        ).where(models.TaskStandard.id.in_(standard_ids))
+    )
+    standards = {row.id: row for row in standard_rows}
+    error_types = await _load_error_types(db, error_type_ids)
+
+    errors: list[schemas.AttemptBatchError] = []
+    valid: list[tuple[schemas.AttemptCreate, list[int]]] = []
+    for index, item in enumerate(items):
+        standard = standards.get(item.standard_id)
+        item_error_ids = _error_type_ids(item.errors)
+        if item.task_id not in known_task_ids or standard is None:
+            detail = "Task or standard not found"
+        elif standard.task_id != item.task_id:
+            detail = "Standard does not belong to task"
+        elif item.ended_at <= item.started_at:
+            detail = "ended_at must be after started_at"
+        elif _has_unknown_error_type(item_error_ids, error_types):
+            detail = UNKNOWN_ERROR_TYPE
+        else:
+            valid.append((item, item_error_ids))
+            continue
+        errors.append(schemas.AttemptBatchError(index=index, detail=detail))
+
+    if not valid:
+        return schemas.AttemptBatchOut(created=[], errors=errors)
+
+    severities = [[error_types[error_id].severity for error_id in ids] for _, ids in valid]
+    time_seconds = np.array([int((item.ended_at - item.started_at).total_seconds()) for item, _ in valid])
+    item_standards = [standards[item.standard_id] for item, _ in valid]
+    scores, proficiency = score_attempts(
+        time_seconds,
+        np.array([st.target_time_seconds for st in item_standards]),
+        np.array([st.max_minor_errors or 0 for st in item_standards]),
+        np.array([st.max_major_errors or 0 for st in item_standards]),
+        np.array([sev.count("minor") for sev in severities]),
+        np.array([sev.count("major") for sev in severities]),
+        np.array([sev.count("critical") for sev in severities]),
+    )
+
+    now = datetime.utcnow()
+    attempt_rows = [
+        {
+            "user_id": current_user.id,
+            "task_id": item.task_id,
+            "standard_id": item.standard_id,
+            "started_at": item.started_at,
+            "ended_at": item.ended_at,
+            "time_seconds": int(time_seconds[i]),
+            "score": int(scores[i]),
+            "proficiency": bool(proficiency[i]),
+            "created_at": now,
+        }
+        for i, (item, _) in enumerate(valid)
+    ]
+    attempt_ids = (
+        await db.scalars(
+            insert(models.Attempt).returning(models.Attempt.id, sort_by_parameter_order=True),
+            attempt_rows,
         )
-    return results
+    ).all()
 
+    error_rows = [
+        {"attempt_id": attempt_id, "error_type_id": error_id}
+        for attempt_id, (_, ids) in zip(attempt_ids, valid)
+        for error_id in ids
+    ]
+    if error_rows:
+        await db.execute(insert(models.AttemptError), error_rows)
+    await db.run_sync(
+        record_best_attempts,
+        [
+            {
+                "user_id": row["user_id"],
+                "task_id": row["task_id"],
+                "attempt_id": attempt_id,
+                "score": row["score"],
+                "time_seconds": row["time_seconds"],
+            }
+            for attempt_id, row in zip(attempt_ids, attempt_rows)
+        ],
+    )
+    await db.run_sync(
+        record_streaks,
+        [
+            {
+                **row,
+                "attempt_id": attempt_id,
+                "consecutive_required": standards[row["standard_id"]].consecutive_required,
+            }
+            for attempt_id, row in zip(attempt_ids, attempt_rows)
+        ],
+    )
+    await db.run_sync(record_team_stats, attempt_rows)
+    await db.commit()
+    for row in attempt_rows:
+        sketch_store.record(row["task_id"], row["standard_id"], row["score"], row["time_seconds"], row["created_at"])
 
-@router.get("/me/summary", response_model=schemas.UserSummary)
-def user_summary(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    tasks = db.query(models.Task).all()
-    task_details = []
-    proficient_tasks = 0
-
-    for task in tasks:
-        attempts = (
-            db.query(models.Attempt)
-            .filter(models.Attempt.user_id == current_user.id, models.Attempt.task_id == task.id)
-            .all()
+    created = [
+        schemas.AttemptOut(
+            id=attempt_id,
+            task_id=row["task_id"],
+            standard_id=row["standard_id"],
+            started_at=row["started_at"],
+            ended_at=row["ended_at"],
+            time_seconds=row["time_seconds"],
+            score=row["score"],
+            proficiency=row["proficiency"],
+            errors=[
+                schemas.ErrorTypeOut.model_validate(error_types[error_id], from_attributes=True)
+                for error_id in ids
+            ],
+            percentile_rank=sketch_store.score_rank(row["task_id"], row["standard_id"], row["score"]),
         )
-        if attempts:
-            best_time = min(a.time_seconds for a in attempts)
-            best_score = max(a.score for a in attempts)
-            if any(a.proficiency for a in attempts):
-                proficient_tasks += 1
-        else:
-            best_time = None
-            best_score = None
-        task_details.append(
-            schemas.UserTaskSummary(
-                task_id=task.id,
-                task_name=task.name,
-                best_time_seconds=best_time,
-                best_score=best_score,
+        for attempt_id, row, (_, ids) in zip(attempt_ids, attempt_rows, valid)
+    ]
+    return schemas.AttemptBatchOut(created=created, errors=errors)
+
+
+def _encode_cursor(attempt: models.Attempt) -> str:
+    raw = f"{attempt.created_at.isoformat()}|{attempt.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, attempt_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(attempt_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/me", response_model=schemas.AttemptPage)
+async def list_my_attempts(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Return the user's attempts newest first, one keyset page at a time.
+
+    Pages are keyed on ``(created_at, id)``; pass ``next_cursor`` back as
+    ``cursor`` to continue. Errors and their types are loaded in batch, so a
+    page costs the same handful of queries whatever its size.
+    """
+    query = (
+        select(models.Attempt)
+        .options(selectinload(models.Attempt.errors).selectinload(models.AttemptError.error_type))
+        .where(models.Attempt.user_id == current_user.id)
+    )
+    if task_id is not None:
+        query = query.where(models.Attempt.task_id == task_id)
+    if since is not None:
+        query = query.where(models.Attempt.created_at >= since)
+    if until is not None:
+        query = query.where(models.Attempt.created_at < until)
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.where(
+            or_(
+                models.Attempt.created_at < cursor_created_at,
+                and_(models.Attempt.created_at == cursor_created_at, models.Attempt.id < cursor_id),
             )
         )
 
-    return schemas.UserSummary(
-        proficient_tasks=proficient_tasks,
-        total_tasks=len(tasks),
-        task_details=task_details,
+    # Fetch one extra row to learn whether another page exists.
+    attempts = (
+        await db.scalars(query.order_by(models.Attempt.created_at.desc(), models.Attempt.id.desc()).limit(limit + 1))
+    ).all()
+    has_more = len(attempts) > limit
+    attempts = attempts[:limit]
+
+    items = [
+        schemas.AttemptOut(
+            id=attempt.id,
+            task_id=attempt.task_id,
+            standard_id=attempt.standard_id,
+            started_at=attempt.started_at,
+            ended_at=attempt.ended_at,
+            time_seconds=attempt.time_seconds,
+            score=attempt.score,
+            proficiency=attempt.proficiency,
+            errors=[schemas.ErrorTypeOut.model_validate(ae.error_type, from_attributes=True) for ae in attempt.errors],
+            percentile_rank=sketch_store.score_rank(attempt.task_id, attempt.standard_id, attempt.score),
+        )
+        for attempt in attempts
+    ]
+    return schemas.AttemptPage(
+        items=items,
+        next_cursor=_encode_cursor(attempts[-1]) if has_more else None,
     )
 
 
-@router.post("/{attempt_id}/video", status_code=status.HTTP_201_CREATED)
-def attach_video(
-    attempt_id: int,
-    file: UploadFile,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+@router.get("/me/summary", response_model=schemas.UserSummary)
+async def user_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
 ):
-    attempt = (
-        db.query(models.Attempt)
-        .filter(models.Attempt.id == attempt_id, models.Attempt.user_id == current_user.id)
-        .first()
+    stats = (
+        select(
+            models.Attempt.task_id.label("task_id"),
+            func.min(models.Attempt.time_seconds).label("best_time_seconds"),
+            func.max(models.Attempt.score).label("best_score"),
+        )
+        .where(models.Attempt.user_id == current_user.id)
+        .group_by(models.Attempt.task_id)
+        .subquery()
+    )
+    # Proficiency means `consecutive_required` proficient reps in a row on a
+    # standard; the streak table holds that per standard, so no history scan.
+    streaks = (
+        select(
+            models.ProficiencyStreak.task_id.label("task_id"),
+            func.max(models.ProficiencyStreak.current_run).label("current_streak"),
+            func.max(models.ProficiencyStreak.best_run).label("best_streak"),
+            func.min(models.ProficiencyStreak.achieved_at).label("proficient_at"),
+        )
+        .where(models.ProficiencyStreak.user_id == current_user.id)
+        .group_by(models.ProficiencyStreak.task_id)
+        .subquery()
     )
-    if not attempt:
-        raise HTTPException(status_code=404, detail="Attempt not found")
+    # One grouped query regardless of how many attempts the user has logged.
+    rows = (
+        await db.execute(
+            select(
+                models.Task.id,
+                models.Task.name,
+                stats.c.best_time_seconds,
+                stats.c.best_score,
+                streaks.c.current_streak,
+                streaks.c.best_streak,
+                streaks.c.proficient_at,
+            )
+            .outerjoin(stats, stats.c.task_id == models.Task.id)
+            .outerjoin(streaks, streaks.c.task_id == models.Task.id)
+            .order_by(models.Task.id)
+        )
+    ).all()
 
-    storage_path = f"videos/{attempt_id}_{file.filename}"
-    with open(storage_path, "wb") as f:
-        f.write(file.file.read())
+    task_details = [
+        schemas.UserTaskSummary(
+            task_id=row.id,
+            task_name=row.name,
+            best_time_seconds=row.best_time_seconds,
+            best_score=row.best_score,
+            current_streak=row.current_streak or 0,
+            best_streak=row.best_streak or 0,
+            proficient=row.proficient_at is not None,
+            proficient_at=row.proficient_at,
+        )
+        for row in rows
+    ]
+    proficient_tasks = sum(1 for row in rows if row.proficient_at is not None)
 
-    video = models.Video(attempt_id=attempt.id, storage_url=storage_path)
-    db.add(video)
-    db.commit()
-    return {"attempt_id": attempt.id, "video_url": storage_path}
+    return schemas.UserSummary(
+        proficient_tasks=proficient_tasks,
+        total_tasks=len(rows),
+        task_details=task_details,
+    )
@@ -1,39 +1,58 @@
 from datetime import timedelta
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models, schemas
-from ..db import get_db
-from ..security import create_access_token, get_current_user, get_password_hash, verify_password
+from ..db import get_async_db
+from ..security import (
+    create_access_token,
+    get_current_user,
+    hash_password_async,
+    verify_and_update_password_async,
+)
 
-router = APIRouter()
+router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+async def _get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+
+# bcrypt is awaited on its dedicated executor (see security.py), so neither
+# hashing nor the database calls hold a worker thread.
 @router.post("/register", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def register(payload: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.User).filter(models.User.email == payload.email).first()
+async def register(payload: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await _get_user_by_email(db, payload.email)
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     user = models.User(
         email=payload.email,
         full_name=payload.full_name,
-        password_hash=get_password_hash(payload.password),
+        password_hash=await hash_password_async(payload.password),
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user_by_email(db, form_data.username)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect email or password")
+    valid, new_hash = await verify_and_update_password_async(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect email or password")
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
     access_token_expires = timedelta(minutes=60)
-    token = create_access_token({"sub": user.id}, expires_delta=access_token_expires)
+    token = create_access_token({"sub": user.id, "email": user.email}, expires_delta=access_token_expires)
     return schemas.Token(access_token=token)
 
 
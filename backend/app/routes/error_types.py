@@ -1,12 +1,11 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Request
 
-from .. import models, schemas
-from ..db import get_db
+from .. import schemas
+from ..catalog import cached_response, catalog
 
-router = APIRouter()
+router = APIRouter(prefix="/error-types", tags=["error-types"])
 
 
 @router.get("/", response_model=list[schemas.ErrorTypeOut])
-def list_error_types(db: Session = Depends(get_db)):
-    return db.query(models.ErrorType).all()
+def list_error_types(request: Request):
+    return cached_response(request, catalog.snapshot().error_types)
@@ -1,50 +1,100 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models, schemas
-from ..db import get_db
+from ..db import get_async_db
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+
+def _leaderboard_query(task_id: Optional[int], limit: int, team_id: Optional[int] = None):
+    proficient_at = (
+        select(func.min(models.ProficiencyStreak.achieved_at))
+        .where(
+            models.ProficiencyStreak.user_id == models.BestAttempt.user_id,
+            models.ProficiencyStreak.task_id == models.BestAttempt.task_id,
+        )
+        .scalar_subquery()
+        .label("proficient_at")
+    )
+    query = (
+        select(
+            models.BestAttempt.user_id,
+            models.User.email,
+            models.BestAttempt.task_id,
+            models.Task.name,
+            models.BestAttempt.score,
+            models.BestAttempt.time_seconds,
+            proficient_at,
+        )
+        .join(models.User, models.User.id == models.BestAttempt.user_id)
+        .join(models.Task, models.Task.id == models.BestAttempt.task_id)
+    )
+    if task_id is not None:
+        query = query.where(models.BestAttempt.task_id == task_id)
+    if team_id is not None:
+        query = query.join(
+            models.TeamMembership,
+            and_(
+                models.TeamMembership.user_id == models.BestAttempt.user_id,
+                models.TeamMembership.team_id == team_id,
+            ),
+        )
 
-router = APIRouter()
+    return query.order_by(
+        models.BestAttempt.score.desc(),
+        models.BestAttempt.time_seconds.asc(),
+        models.BestAttempt.attempt_id.asc(),
+    ).limit(limit)
+
+
+def _entries(rows) -> list[schemas.LeaderboardEntry]:
+    return [
+        schemas.LeaderboardEntry(
+            user_id=row.user_id,
+            user_email=row.email,
+            task_id=row.task_id,
+            task_name=row.name,
+            score=row.score,
+            time_seconds=row.time_seconds,
+            proficient=row.proficient_at is not None,
+            proficient_at=row.proficient_at,
+        )
+        for row in rows
+    ]
 
 
 @router.get("/global", response_model=list[schemas.LeaderboardEntry])
-def global_leaderboard(db: Session = Depends(get_db)):
+async def global_leaderboard(
+    task_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+):
     """Return top attempts across all users and tasks.
 
     Results are ordered by score (desc) then time (asc) and capped to the
     fastest/best-scoring attempt per user per task to keep the table concise.
+    Rows come from ``best_attempts``, which holds exactly one entry per user
+    per task, so the read walks the rank index and stops after ``limit`` rows.
+    Proficiency comes from ``proficiency_streaks``, one indexed lookup per row.
     """
+    return _entries(await db.execute(_leaderboard_query(task_id, limit)))
 
-    attempts = (
-        db.query(models.Attempt)
-        .join(models.User)
-        .join(models.Task)
-        .order_by(models.Attempt.score.desc(), models.Attempt.time_seconds.asc())
-        .all()
-    )
-
-    seen_pairs: set[tuple[int, int]] = set()
-    leaderboard: list[schemas.LeaderboardEntry] = []
-
-    for attempt in attempts:
-        pair = (attempt.user_id, attempt.task_id)
-        if pair in seen_pairs:
-            continue
-        seen_pairs.add(pair)
-
-        leaderboard.append(
-            schemas.LeaderboardEntry(
-                user_id=attempt.user_id,
-                user_email=attempt.user.email,
-                task_id=attempt.task_id,
-                task_name=attempt.task.name,
-                score=attempt.score,
-                time_seconds=attempt.time_seconds,
-            )
-        )
-
-        if len(leaderboard) >= 50:
-            break
 
-    return leaderboard
+@router.get("/team/{team_id}", response_model=list[schemas.LeaderboardEntry])
+async def team_leaderboard(
+    team_id: int,
+    task_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Return the team's members ranked as on the global board.
 
+    The same ``best_attempts`` read, joined to the team's memberships.
+    """
+    if await db.get(models.Team, team_id) is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return _entries(await db.execute(_leaderboard_query(task_id, limit, team_id)))
@@ -1,28 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from .. import models, schemas
-from ..db import get_db
+from fastapi import APIRouter, HTTPException, Query, Request
 
-router = APIRouter()
+from .. import schemas
+from ..catalog import cached_response, catalog
+from ..sketches import SKETCH_RELATIVE_ACCURACY, sketch_store
+
+router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
 @router.get("/", response_model=list[schemas.TaskOut])
-def list_tasks(db: Session = Depends(get_db)):
-    return db.query(models.Task).all()
+def list_tasks(request: Request):
+    return cached_response(request, catalog.snapshot().tasks)
 
 
 @router.get("/{slug}", response_model=schemas.TaskOut)
-def get_task(slug: str, db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.slug == slug).first()
-    if not task:
+def get_task(slug: str, request: Request):
+    cached = catalog.snapshot().task_by_slug.get(slug)
+    if not cached:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    return cached_response(request, cached)
 
 
 @router.get("/{task_id}/standards", response_model=list[schemas.TaskStandardOut])
-def list_standards(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
+def list_standards(task_id: int, request: Request):
+    cached = catalog.snapshot().standards_by_task_id.get(task_id)
+    if not cached:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return cached_response(request, cached)
+
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+@router.get("/{task_id}/percentiles", response_model=schemas.TaskPercentilesOut)
+def task_percentiles(
+    task_id: int,
+    standard_id: Optional[int] = None,
+    score: Optional[int] = Query(None, ge=0, le=100),
+    time_seconds: Optional[int] = Query(None, ge=0),
+):
+    """Score and time percentiles per standard, and where a given result stands.
+
+    ``score_rank`` is the percent of attempts that scored lower and
+    ``time_rank`` the percent that took longer (ties count half). Answered from
+    the in-memory sketches (``app.sketches``), so the cost does not grow with
+    the number of attempts; times are within ``time_relative_accuracy``.
+    """
+    if task_id not in catalog.snapshot().standards_by_task_id:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task.standards
+    sketches = sketch_store.for_task(task_id)
+    if standard_id is not None:
+        sketches = {standard_id: sketches[standard_id]} if standard_id in sketches else {}
+
+    standards = []
+    for std_id, sketch in sorted(sketches.items()):
+        time_rank = sketch.time.rank(time_seconds) if time_seconds is not None else None
+        standards.append(
+            schemas.StandardPercentiles(
+                standard_id=std_id,
+                attempts=sketch.count,
+                score={f"p{p}": sketch.score.quantile(p / 100) for p in PERCENTILES},
+                time_seconds={f"p{p}": _round(sketch.time.quantile(p / 100)) for p in PERCENTILES},
+                score_rank=sketch_store.score_rank(task_id, std_id, score) if score is not None else None,
+                time_rank=round((1 - time_rank) * 100, 1) if time_rank is not None else None,
+            )
+        )
+    return schemas.TaskPercentilesOut(
+        task_id=task_id,
+        time_relative_accuracy=SKETCH_RELATIVE_ACCURACY,
+        standards=standards,
+    )
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..db import get_async_db
+from ..security import get_current_admin
+from ..team_stats import add_member, median_time, remove_member
+
+router = APIRouter(prefix="/teams", tags=["teams"])
+
+
+@router.get("/", response_model=list[schemas.TeamOut])
+async def list_teams(db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(models.Team).order_by(models.Team.name))).all()
+
+
+@router.post("/", response_model=schemas.TeamOut, status_code=status.HTTP_201_CREATED)
+async def create_team(
+    payload: schemas.TeamCreate,
+    db: AsyncSession = Depends(get_async_db),
+    admin: models.User = Depends(get_current_admin),
+):
+    team = models.Team(name=payload.name.strip())
+    db.add(team)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Team name already exists")
+    await db.refresh(team)
+    return team
+
+
+async def _get_team(db: AsyncSession, team_id: int) -> models.Team:
+    team = await db.get(models.Team, team_id)
+    if team is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return team
+
+
+@router.put("/{team_id}/members/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def add_team_member(
+    team_id: int,
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    admin: models.User = Depends(get_current_admin),
+):
+    """Add a user to a team; their attempt history joins the team rollups."""
+    await _get_team(db, team_id)
+    if await db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.run_sync(add_member, team_id, user_id)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.delete("/{team_id}/members/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_team_member(
+    team_id: int,
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    admin: models.User = Depends(get_current_admin),
+):
+    """Remove a user from a team; their attempt history leaves the team rollups."""
+    await _get_team(db, team_id)
+    if not await db.run_sync(remove_member, team_id, user_id):
+        raise HTTPException(status_code=404, detail="User is not a member of this team")
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{team_id}/summary", response_model=schemas.TeamSummary)
+async def team_summary(team_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Attempt counts, mean and median time, mean score and proficiency per task for a team.
+
+    Everything comes from the rollup tables kept current on attempt writes and
+    membership changes, plus one indexed streak lookup per member for the
+    number of members who reached proficiency; raw attempts are never read.
+    """
+    team = await _get_team(db, team_id)
+    members = await db.scalar(
+        select(func.count()).select_from(models.TeamMembership).where(models.TeamMembership.team_id == team_id)
+    )
+
+    stats = (
+        await db.execute(
+            select(models.TeamTaskStats, models.Task.name)
+            .join(models.Task, models.Task.id == models.TeamTaskStats.task_id)
+            .where(models.TeamTaskStats.team_id == team_id, models.TeamTaskStats.attempts > 0)
+            .order_by(models.TeamTaskStats.task_id)
+        )
+    ).all()
+
+    histograms: dict[int, list[tuple[int, int]]] = {}
+    for task_id, seconds, count in await db.execute(
+        select(models.TeamTaskTime.task_id, models.TeamTaskTime.time_seconds, models.TeamTaskTime.count)
+        .where(models.TeamTaskTime.team_id == team_id, models.TeamTaskTime.count > 0)
+        .order_by(models.TeamTaskTime.task_id, models.TeamTaskTime.time_seconds)
+    ):
+        histograms.setdefault(task_id, []).append((seconds, count))
+
+    proficient_members = dict(
+        (
+            await db.execute(
+                select(
+                    models.ProficiencyStreak.task_id,
+                    func.count(func.distinct(models.ProficiencyStreak.user_id)),
+                )
+                .join(models.TeamMembership, models.TeamMembership.user_id == models.ProficiencyStreak.user_id)
+                .where(models.TeamMembership.team_id == team_id, models.ProficiencyStreak.achieved_at.is_not(None))
+                .group_by(models.ProficiencyStreak.task_id)
+            )
+        ).all()
+    )
+
+    return schemas.TeamSummary(
+        team_id=team.id,
+        team_name=team.name,
+        members=members,
+        tasks=[
+            schemas.TeamTaskSummary(
+                task_id=row.task_id,
+                task_name=name,
+                attempts=row.attempts,
+                mean_time_seconds=round(row.time_seconds_sum / row.attempts, 2),
+                median_time_seconds=median_time(histograms.get(row.task_id, [])),
+                mean_score=round(row.score_sum / row.attempts, 2),
+                proficiency_rate=round(row.proficient_attempts / row.attempts, 4),
+                proficient_members=proficient_members.get(row.task_id, 0),
+            )
+            for row, name in stats
+        ],
+    )
@@ -0,0 +1,362 @@
+import hashlib
+import mimetypes
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from .. import models, schemas
+from ..db import get_async_db, get_db
+from ..jobs import new_job
+from ..security import CurrentUser, get_current_user_claims
+from ..storage import (
+    MAX_VIDEO_BYTES,
+    VIDEO_ACCEL_REDIRECT_PREFIX,
+    VIDEO_DIR,
+    ChunkWriter,
+    file_sha256,
+    iter_upload_file,
+    stored_bytes,
+    too_large,
+    video_path,
+)
+from ..utils import etag_matches
+
+router = APIRouter(prefix="/attempts", tags=["videos"])
+
+TUS_VERSION = "1.0.0"
+TUS_CONTENT_TYPE = "application/offset+octet-stream"
+# A PATCH holds the upload for this long after its last renewal; a crashed
+# writer blocks resuming for at most this long.
+UPLOAD_LEASE_SECONDS = float(os.getenv("UPLOAD_LEASE_SECONDS", "60"))
+
+
+async def _get_owned_attempt(db: AsyncSession, attempt_id: int, user_id: int) -> models.Attempt:
+    attempt = await db.scalar(
+        select(models.Attempt).where(models.Attempt.id == attempt_id, models.Attempt.user_id == user_id)
+    )
+    if not attempt:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    return attempt
+
+
+async def _get_upload(db: AsyncSession, attempt_id: int, upload_id: str, user_id: int) -> models.VideoUpload:
+    upload = await db.scalar(
+        select(models.VideoUpload).where(
+            models.VideoUpload.id == upload_id,
+            models.VideoUpload.attempt_id == attempt_id,
+            models.VideoUpload.user_id == user_id,
+        )
+    )
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+async def _complete_upload(db: AsyncSession, upload: models.VideoUpload, sha256: str) -> None:
+    video = models.Video(attempt_id=upload.attempt_id, storage_url=upload.storage_path)
+    db.add(video)
+    await db.flush()
+    db.add(new_job(upload.attempt_id, video.id))
+    upload.video_id = video.id
+    upload.sha256 = sha256
+    await db.commit()
+
+
+async def _claim_upload(db: AsyncSession, upload: models.VideoUpload, offset: int) -> str:
+    """Take the upload's write lease at ``offset``; 409/423 if it moved on or is being written."""
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    table = models.VideoUpload
+    result = await db.execute(
+        update(table)
+        .where(
+            table.id == upload.id,
+            table.upload_offset == offset,
+            table.video_id.is_(None),
+            or_(table.lock_token.is_(None), table.updated_at < now - timedelta(seconds=UPLOAD_LEASE_SECONDS)),
+        )
+        .values(lock_token=token, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if result.rowcount == 1:
+        return token
+    await db.refresh(upload)
+    if upload.video_id is not None:
+        raise HTTPException(status_code=409, detail="Upload already complete")
+    if upload.upload_offset != offset:
+        raise HTTPException(status_code=409, detail="Upload-Offset does not match the server offset")
+    raise HTTPException(status_code=423, detail="Another request is writing to this upload")
+
+
+async def _renewing(chunks: AsyncIterator[bytes], db: AsyncSession, upload_id: str, token: str):
+    """Pass ``chunks`` through, renewing the lease before a chunk is written once a third of it has passed."""
+    renewed = time.monotonic()
+    async for chunk in chunks:
+        if time.monotonic() - renewed > UPLOAD_LEASE_SECONDS / 3:
+            result = await db.execute(
+                update(models.VideoUpload)
+                .where(models.VideoUpload.id == upload_id, models.VideoUpload.lock_token == token)
+                .values(updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                raise HTTPException(status_code=409, detail="Upload was taken over by another request")
+            renewed = time.monotonic()
+        yield chunk
+
+
+async def _release_upload(db: AsyncSession, upload: models.VideoUpload, token: str, offset: int) -> None:
+    """Record ``offset`` and drop the lease, unless another request has taken it over."""
+    await db.rollback()
+    await db.execute(
+        update(models.VideoUpload)
+        .where(models.VideoUpload.id == upload.id, models.VideoUpload.lock_token == token)
+        .values(upload_offset=offset, lock_token=None, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await db.refresh(upload)
+
+
+def _remove_file(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _upload_headers(upload: models.VideoUpload) -> dict[str, str]:
+    headers = {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(upload.upload_offset),
+        "Upload-Length": str(upload.upload_length),
+        "Cache-Control": "no-store",
+    }
+    if upload.sha256:
+        headers["Upload-Checksum"] = f"sha256 {upload.sha256}"
+    return headers
+
+
+@router.post("/{attempt_id}/video", status_code=status.HTTP_201_CREATED)
+async def attach_video(
+    attempt_id: int,
+    file: UploadFile,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Store a video in one request, streamed to disk in fixed-size chunks.
+
+    Large recordings over unreliable links should use the resumable
+    ``/video/uploads`` endpoints instead.
+    """
+    attempt = await _get_owned_attempt(db, attempt_id, current_user.id)
+
+    storage_path = video_path(attempt.id, file.filename)
+    digest = hashlib.sha256()
+    try:
+        size = await ChunkWriter(storage_path, digest=digest).write_from(iter_upload_file(file))
+    except Exception:
+        await run_in_threadpool(_remove_file, storage_path)
+        raise
+
+    video = models.Video(attempt_id=attempt.id, storage_url=storage_path)
+    db.add(video)
+    await db.flush()
+    # Frame analysis runs later in `python -m app.worker`; poll GET /attempts/{id}/analysis.
+    db.add(new_job(attempt.id, video.id))
+    await db.commit()
+    return {
+        "attempt_id": attempt.id,
+        "video_url": storage_path,
+        "size_bytes": size,
+        "sha256": digest.hexdigest(),
+    }
+
+
+@router.post("/{attempt_id}/video/uploads", status_code=status.HTTP_201_CREATED)
+async def create_video_upload(
+    attempt_id: int,
+    upload_length: int = Header(..., ge=1),
+    filename: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Open a resumable upload (tus-style creation); the body is sent with PATCH."""
+    if upload_length > MAX_VIDEO_BYTES:
+        raise too_large()
+    attempt = await _get_owned_attempt(db, attempt_id, current_user.id)
+
+    upload_id = uuid.uuid4().hex
+    upload = models.VideoUpload(
+        id=upload_id,
+        attempt_id=attempt.id,
+        user_id=current_user.id,
+        filename=filename or "video",
+        storage_path=video_path(attempt.id, filename, prefix=f"{upload_id}_"),
+        upload_length=upload_length,
+        upload_offset=0,
+    )
+    db.add(upload)
+    await db.commit()
+    headers = _upload_headers(upload)
+    headers["Location"] = f"/attempts/{attempt.id}/video/uploads/{upload_id}"
+    return Response(status_code=status.HTTP_201_CREATED, headers=headers)
+
+
+@router.head("/{attempt_id}/video/uploads/{upload_id}")
+async def get_video_upload_offset(
+    attempt_id: int,
+    upload_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Report how many bytes the server holds so a client can resume."""
+    upload = await _get_upload(db, attempt_id, upload_id, current_user.id)
+    return Response(status_code=status.HTTP_200_OK, headers=_upload_headers(upload))
+
+
+@router.patch("/{attempt_id}/video/uploads/{upload_id}")
+async def append_video_upload(
+    attempt_id: int,
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    content_type: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Append the request body at ``Upload-Offset``.
+
+    Bytes received before a dropped connection are kept, so the client
+    resumes from the offset reported by HEAD rather than from zero. Only one
+    PATCH writes an upload at a time; a concurrent one gets 423.
+    """
+    if content_type != TUS_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be {TUS_CONTENT_TYPE}")
+    upload = await _get_upload(db, attempt_id, upload_id, current_user.id)
+    token = await _claim_upload(db, upload, upload_offset)
+
+    offset = upload_offset
+    try:
+        if await run_in_threadpool(stored_bytes, upload.storage_path) < offset:
+            # The partial file was lost (e.g. storage wiped); make the client start over.
+            offset = 0
+            raise HTTPException(status_code=409, detail="Stored upload data is missing; resume from offset 0")
+
+        # A body that covers the whole file can be hashed in flight; resumed uploads
+        # are hashed from disk once complete.
+        digest = hashlib.sha256() if offset == 0 else None
+        writer = ChunkWriter(upload.storage_path, offset=offset, limit=upload.upload_length, digest=digest)
+        try:
+            await writer.write_from(_renewing(request.stream(), db, upload.id, token))
+        except ClientDisconnect:
+            pass
+        finally:
+            offset = writer.offset
+
+        if offset == upload.upload_length:
+            if digest is not None:
+                sha256 = digest.hexdigest()
+            else:
+                sha256 = await run_in_threadpool(file_sha256, upload.storage_path)
+            await _complete_upload(db, upload, sha256)
+    finally:
+        await _release_upload(db, upload, token, offset)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_upload_headers(upload))
+
+
+@router.get("/{attempt_id}/analysis", response_model=schemas.AttemptAnalysisOut)
+async def get_attempt_analysis(
+    attempt_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Analysis status per uploaded video, with results once a worker has finished."""
+    attempt = await _get_owned_attempt(db, attempt_id, current_user.id)
+    rows = await db.execute(
+        select(models.AnalysisJob, models.AttemptAnalysis)
+        .outerjoin(models.AttemptAnalysis, models.AttemptAnalysis.video_id == models.AnalysisJob.video_id)
+        .where(models.AnalysisJob.attempt_id == attempt.id)
+        .order_by(models.AnalysisJob.id)
+    )
+    return schemas.AttemptAnalysisOut(
+        attempt_id=attempt.id,
+        videos=[
+            schemas.VideoAnalysisOut(
+                job_id=job.id,
+                video_id=job.video_id,
+                status=job.status,
+                attempts=job.attempts,
+                max_attempts=job.max_attempts,
+                last_error=job.last_error,
+                updated_at=job.updated_at,
+                frames_analyzed=analysis.frames_analyzed if analysis else None,
+                mode=analysis.mode if analysis else None,
+                results=analysis.results if analysis else None,
+            )
+            for job, analysis in rows
+        ],
+    )
+
+
+@router.api_route("/{attempt_id}/video/{video_id}", methods=["GET", "HEAD"])
+def stream_video(
+    attempt_id: int,
+    video_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user_claims),
+):
+    """Play back an attempt video with HTTP Range support.
+
+    Seeking only transfers the requested byte ranges, and ETag/Last-Modified
+    let the player revalidate instead of re-downloading. Whole-file responses
+    use the server's ``http.response.pathsend`` (zero-copy) extension when it
+    offers one; set ``VIDEO_ACCEL_REDIRECT_PREFIX`` to delegate to nginx.
+    """
+    video = (
+        db.query(models.Video)
+        .join(models.Attempt, models.Attempt.id == models.Video.attempt_id)
+        .filter(
+            models.Video.id == video_id,
+            models.Video.attempt_id == attempt_id,
+            models.Attempt.user_id == current_user.id,
+        )
+        .first()
+    )
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    try:
+        stat_result = os.stat(video.storage_url)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Video file missing")
+
+    media_type = mimetypes.guess_type(video.storage_url)[0] or "application/octet-stream"
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, max-age=3600"}
+    if VIDEO_ACCEL_REDIRECT_PREFIX:
+        relative = os.path.relpath(video.storage_url, VIDEO_DIR)
+        headers["X-Accel-Redirect"] = VIDEO_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative
+        return Response(headers=headers, media_type=media_type)
+
+    response = FileResponse(video.storage_url, media_type=media_type, stat_result=stat_result, headers=headers)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, response.headers["etag"]):
+        return Response(
+            status_code=304,
+            headers={
+                **headers,
+                "ETag": response.headers["etag"],
+                "Last-Modified": response.headers["last-modified"],
+            },
+        )
+    return response
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 class Token(BaseModel):
@@ -82,16 +82,40 @@ class AttemptOut(BaseModel):
     score: int
     proficiency: bool
     errors: List[ErrorTypeOut]
+    percentile_rank: Optional[float] = None
 
     class Config:
         orm_mode = True
 
 
+class AttemptBatchCreate(BaseModel):
+    attempts: List[AttemptCreate] = Field(..., min_length=1, max_length=500)
+
+
+class AttemptBatchError(BaseModel):
+    index: int
+    detail: str
+
+
+class AttemptBatchOut(BaseModel):
+    created: List[AttemptOut]
+    errors: List[AttemptBatchError] = []
+
+
+class AttemptPage(BaseModel):
+    items: List[AttemptOut]
+    next_cursor: Optional[str] = None
+
+
 class UserTaskSummary(BaseModel):
     task_id: int
     task_name: str
     best_time_seconds: Optional[int]
     best_score: Optional[int]
+    current_streak: int = 0
+    best_streak: int = 0
+    proficient: bool = False
+    proficient_at: Optional[datetime] = None
 
 
 class UserSummary(BaseModel):
@@ -111,11 +135,59 @@ class LeaderboardEntry(BaseModel):
     task_name: str
     score: int
     time_seconds: int
+    proficient: bool = False
+    proficient_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+class TeamCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+
+
+class TeamOut(BaseModel):
+    id: int
+    name: str
+    created_at: datetime
 
     class Config:
         orm_mode = True
 
 
+class TeamTaskSummary(BaseModel):
+    task_id: int
+    task_name: str
+    attempts: int
+    mean_time_seconds: float
+    median_time_seconds: Optional[float] = None
+    mean_score: float
+    proficiency_rate: float
+    proficient_members: int = 0
+
+
+class TeamSummary(BaseModel):
+    team_id: int
+    team_name: str
+    members: int
+    tasks: List[TeamTaskSummary] = []
+
+
+class StandardPercentiles(BaseModel):
+    standard_id: int
+    attempts: int
+    score: dict[str, Optional[float]]
+    time_seconds: dict[str, Optional[float]]
+    score_rank: Optional[float] = None
+    time_rank: Optional[float] = None
+
+
+class TaskPercentilesOut(BaseModel):
+    task_id: int
+    time_relative_accuracy: float
+    standards: List[StandardPercentiles] = []
+
+
 class Profile(BaseModel):
     id: int
     email: EmailStr
@@ -124,3 +196,53 @@ class Profile(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ImagePrediction(BaseModel):
+    class_index: int
+    label: str
+    probability: float
+
+
+class ImageAnalysisOut(BaseModel):
+    predictions: List[ImagePrediction]
+    batch_size: int
+    inference_ms: float
+
+
+class VideoAnalysisOut(BaseModel):
+    job_id: int
+    video_id: int
+    status: str
+    attempts: int
+    max_attempts: int
+    last_error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    frames_analyzed: Optional[int] = None
+    mode: Optional[str] = None
+    results: Optional[dict] = None
+
+
+class AttemptAnalysisOut(BaseModel):
+    attempt_id: int
+    videos: List[VideoAnalysisOut]
+
+
+class LearningCurvePoint(BaseModel):
+    rep: int
+    created_at: datetime
+    time_seconds: int
+    score: int
+    proficiency: bool
+    time_moving_avg: float
+    score_moving_avg: float
+
+
+class LearningCurveOut(BaseModel):
+    task_id: int
+    attempts: int
+    window: int
+    reps_to_proficiency: Optional[int] = None
+    plateau_rep: Optional[int] = None
+    plateau_score: Optional[float] = None
+    points: List[LearningCurvePoint] = []
@@ -0,0 +1,67 @@
+"""Attempt scoring rules, for single attempts and for columnar batches."""
+from collections import Counter
+
+import numpy as np
+
+from . import models
+
+
+def score_attempt(time_seconds: int, standard: models.TaskStandard, error_types: list[models.ErrorType]):
+    score = 100
+    extra_seconds = max(0, time_seconds - standard.target_time_seconds)
+    score -= min(40, extra_seconds)
+
+    severity_counts = Counter(err.severity for err in error_types)
+    minor_errors = severity_counts.get("minor", 0)
+    major_errors = severity_counts.get("major", 0)
+    critical_errors = severity_counts.get("critical", 0)
+
+    score -= minor_errors * 5
+    score -= major_errors * 15
+
+    if critical_errors > 0:
+        score = min(score, 60)
+        proficiency = False
+    else:
+        proficiency = (
+            time_seconds <= standard.target_time_seconds
+            and minor_errors <= standard.max_minor_errors
+            and major_errors <= standard.max_major_errors
+        )
+    score = max(score, 0)
+    return score, proficiency
+
+
+def score_attempts(
+    time_seconds: np.ndarray,
+    target_time_seconds: np.ndarray,
+    max_minor_errors: np.ndarray,
+    max_major_errors: np.ndarray,
+    minor_errors: np.ndarray,
+    major_errors: np.ndarray,
+    critical_errors: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized ``score_attempt`` over aligned per-attempt arrays.
+
+    Each argument holds one value per attempt; standard limits are repeated
+    for every attempt scored against that standard. Returns ``(scores,
+    proficiency)`` as int64 and bool arrays.
+    """
+    time_seconds = np.asarray(time_seconds, dtype=np.int64)
+    target_time_seconds = np.asarray(target_time_seconds, dtype=np.int64)
+    minor_errors = np.asarray(minor_errors, dtype=np.int64)
+    major_errors = np.asarray(major_errors, dtype=np.int64)
+    critical = np.asarray(critical_errors, dtype=np.int64) > 0
+
+    extra_seconds = np.maximum(0, time_seconds - target_time_seconds)
+    scores = 100 - np.minimum(40, extra_seconds) - minor_errors * 5 - major_errors * 15
+    scores = np.where(critical, np.minimum(scores, 60), scores)
+    scores = np.maximum(scores, 0)
+
+    proficiency = (
+        ~critical
+        & (time_seconds <= target_time_seconds)
+        & (minor_errors <= np.asarray(max_minor_errors, dtype=np.int64))
+        & (major_errors <= np.asarray(max_major_errors, dtype=np.int64))
+    )
+    return scores, proficiency
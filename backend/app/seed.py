@@ -1,8 +1,17 @@
 """Seed the SurgiTrack database with initial tasks, standards, and error types."""
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from .db import Base, engine, SessionLocal
+from .db import Base, engine, SessionLocal, upsert_insert
 from . import models
+from .catalog import catalog
+from .rescoring import queue_rescore
+from .streaks import rebuild_streaks
 
 TASKS = [
     {
@@ -498,62 +507,144 @@ ERROR_TYPES = [
 ]
 
 
-def seed():
+SEED_STATE_KEY = "catalog"
+# Used for new standards only; an existing standard keeps its stored value for
+# any key the seed does not set, so edits made in the database survive reseeding.
+STANDARD_DEFAULTS = {
+    "target_time_seconds": 240,
+    "max_minor_errors": 2,
+    "max_major_errors": 0,
+    "consecutive_required": 1,
+    "objective_criteria": {"notes": "Baseline standard"},
+}
+
+
+def seed_fingerprint() -> str:
+    """Content hash of ``TASKS`` and ``ERROR_TYPES``; changes whenever the seed data does."""
+    payload = json.dumps({"tasks": TASKS, "error_types": ERROR_TYPES}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _upsert(db: Session, table, rows: list[dict], conflict: list[str], update: Iterable[str] | None = None) -> None:
+    """Insert ``rows``, updating existing ones; ``update`` limits which columns are overwritten."""
+    stmt = upsert_insert(table).values(rows)
+    updates = {name: stmt.excluded[name] for name in (update or rows[0]) if name not in conflict}
+    db.execute(stmt.on_conflict_do_update(index_elements=conflict, set_=updates))
+
+
+def _scoring_inputs(db: Session) -> tuple[dict, dict]:
+    """Standard limits by id and error severities by name, as attempts were scored with."""
+    standards = {
+        row.id: tuple(row[1:])
+        for row in db.execute(
+            select(
+                models.TaskStandard.id,
+                models.TaskStandard.target_time_seconds,
+                models.TaskStandard.max_minor_errors,
+                models.TaskStandard.max_major_errors,
+                models.TaskStandard.consecutive_required,
+            )
+        )
+    }
+    severities = dict(db.execute(select(models.ErrorType.name, models.ErrorType.severity)).all())
+    return standards, severities
+
+
+def _stale_standards(before: tuple[dict, dict], after: tuple[dict, dict]) -> tuple[list[int], list[int]]:
+    """Standards whose attempts need rescoring, and those where only the streak length changed.
+
+    Scores depend on the time and error limits and the severities; the
+    ``consecutive_required`` streak length only affects ``proficiency_streaks``.
+    """
+    standards_before, severities_before = before
+    standards_after, severities_after = after
+    if any(severities_after.get(name) != severity for name, severity in severities_before.items()):
+        return sorted(standards_before), []
+    rescore, streaks = [], []
+    for sid, limits in sorted(standards_before.items()):
+        new_limits = standards_after.get(sid, limits)
+        if new_limits[:3] != limits[:3]:
+            rescore.append(sid)
+        elif new_limits[3] != limits[3]:
+            streaks.append(sid)
+    return rescore, streaks
+
+
+def seed(force: bool = False):
+    """Bring tasks, standards and error types in line with the seed data.
+
+    Skips entirely when the stored fingerprint matches, which is the common
+    case for every worker start after the first. Otherwise it applies one
+    upsert statement per table.
+    """
     Base.metadata.create_all(bind=engine)
+    fingerprint = seed_fingerprint()
     db: Session = SessionLocal()
     try:
-        for task_data in TASKS:
-            task = db.query(models.Task).filter(models.Task.slug == task_data["slug"]).first()
-            if not task:
-                task = models.Task(
-                    name=task_data["name"],
-                    slug=task_data["slug"],
-                    category=task_data.get("category"),
-                    description=task_data.get("description"),
-                )
-                db.add(task)
-                db.flush()
-            else:
-                task.name = task_data["name"]
-                task.category = task_data.get("category")
-                task.description = task_data.get("description")
+        state = db.get(models.SeedState, SEED_STATE_KEY)
+        if state is not None and state.fingerprint == fingerprint and not force:
+            print("Seed unchanged, skipping")
+            return
 
-            standard_data = task_data.get("standard", {})
-            standard = (
-                db.query(models.TaskStandard)
-                .filter(models.TaskStandard.task_id == task.id, models.TaskStandard.level == "PGY1")
-                .first()
+        scoring_before = _scoring_inputs(db)
+        _upsert(
+            db,
+            models.Task.__table__,
+            [
+                {
+                    "name": task_data["name"],
+                    "slug": task_data["slug"],
+                    "category": task_data.get("category"),
+                    "description": task_data.get("description"),
+                }
+                for task_data in TASKS
+            ],
+            conflict=["slug"],
+        )
+        task_ids = dict(db.execute(select(models.Task.slug, models.Task.id)).all())
+
+        # Group standards by the keys the seed sets, so each upsert overwrites only those.
+        standard_rows: dict[tuple[str, ...], list[dict]] = {}
+        for task_data in TASKS:
+            standard_data = {
+                key: value for key, value in task_data.get("standard", {}).items() if key in STANDARD_DEFAULTS
+            }
+            standard_rows.setdefault(tuple(sorted(standard_data)), []).append(
+                {"task_id": task_ids[task_data["slug"]], "level": "PGY1", **STANDARD_DEFAULTS, **standard_data}
             )
-            if not standard:
-                db.add(
-                    models.TaskStandard(
-                        task_id=task.id,
-                        level="PGY1",
-                        target_time_seconds=standard_data.get("target_time_seconds", 240),
-                        max_minor_errors=standard_data.get("max_minor_errors", 2),
-                        max_major_errors=standard_data.get("max_major_errors", 0),
-                        consecutive_required=standard_data.get("consecutive_required", 1),
-                        objective_criteria=standard_data.get(
-                            "objective_criteria", {"notes": "Baseline standard"}
-                        ),
-                    )
-                )
+        for keys, rows in standard_rows.items():
+            if keys:
+                _upsert(db, models.TaskStandard.__table__, rows, conflict=["task_id", "level"], update=keys)
             else:
-                standard.target_time_seconds = standard_data.get("target_time_seconds", standard.target_time_seconds)
-                standard.max_minor_errors = standard_data.get("max_minor_errors", standard.max_minor_errors)
-                standard.max_major_errors = standard_data.get("max_major_errors", standard.max_major_errors)
-                standard.consecutive_required = standard_data.get(
-                    "consecutive_required", standard.consecutive_required
-                )
-                standard.objective_criteria = standard_data.get(
-                    "objective_criteria", standard.objective_criteria
+                db.execute(
+                    upsert_insert(models.TaskStandard.__table__)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["task_id", "level"])
                 )
 
-        if not db.query(models.ErrorType).count():
-            for err in ERROR_TYPES:
-                db.add(models.ErrorType(**err))
+        _upsert(db, models.ErrorType.__table__, [dict(err) for err in ERROR_TYPES], conflict=["name"])
+
+        stale, streaks_only = _stale_standards(scoring_before, _scoring_inputs(db))
+        if stale:
+            # Stored scores were computed against the old limits; bootstrap runs the job.
+            queue_rescore(db, stale, reason="seed")
+            print(f"Queued rescoring for {len(stale)} changed standard(s)")
+        if streaks_only:
+            # Scores still hold; only the streaks need the new required length.
+            streak_tasks = db.scalars(
+                select(models.TaskStandard.task_id).where(models.TaskStandard.id.in_(streaks_only)).distinct()
+            ).all()
+            rebuild_streaks(db, list(streak_tasks))
+            print(f"Rebuilt streaks for {len(streaks_only)} standard(s) with a new streak length")
 
+        _upsert(
+            db,
+            models.SeedState.__table__,
+            [{"key": SEED_STATE_KEY, "fingerprint": fingerprint, "applied_at": datetime.utcnow()}],
+            conflict=["key"],
+        )
         db.commit()
+        catalog.invalidate()
         print("Seed complete")
     finally:
         db.close()
@@ -0,0 +1,370 @@
+"""Mergeable per-standard distributions of attempt score and time, for percentile ranks.
+
+Scores are integers from 0 to 100, so they get an exact 101-bin histogram.
+Times use a log-bucketed sketch (the DDSketch layout): each value lands in
+bucket ``ceil(log(v) / log(gamma))``, so any quantile comes back within
+``SKETCH_RELATIVE_ACCURACY`` of a true value, with a few hundred buckets
+whatever the number of attempts. Both merge by adding counts, so the
+per-worker deltas and the stored rows combine exactly.
+
+Each worker keeps the stored sketches in memory and adds its own attempts as
+they are logged; every ``SKETCH_FLUSH_SECONDS`` it merges its delta into the
+``task_sketches`` rows and reloads them, picking up the other workers' deltas.
+Reads never touch the database, and cost is bounded by the bucket count.
+
+``rebuild_sketches`` (bootstrap, rescoring) stamps the rows with
+``rebuilt_at`` and counts only attempts created before it; a worker's sync
+keeps just its attempts created at or after it, so each attempt lands on one
+side by its own ``created_at``. The one gap is an attempt flushed before the
+stamp but committed after the rebuild read, which neither side counts until
+the next rebuild. This assumes worker and rebuild clocks agree (UTC, NTP).
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import SessionLocal, upsert_insert
+
+SKETCH_RELATIVE_ACCURACY = float(os.getenv("SKETCH_RELATIVE_ACCURACY", "0.01"))
+SKETCH_FLUSH_SECONDS = float(os.getenv("SKETCH_FLUSH_SECONDS", "10"))
+MAX_SCORE = 100
+
+sketch_table = models.TaskSketch.__table__
+
+
+class LogSketch:
+    """Relative-error quantile sketch over positive values; zero and below are counted apart."""
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY) -> None:
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        # Midpoint (in relative terms) of (gamma^(i-1), gamma^i].
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other: "LogSketch") -> None:
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.bins))
+
+    def rank(self, value: float) -> Optional[float]:
+        """Fraction of values below ``value``, counting half of those in its bucket."""
+        if self.count <= 0:
+            return None
+        if value <= 0:
+            return self.zero_count / 2 / self.count
+        target = self._index(value)
+        below = self.zero_count + sum(count for index, count in self.bins.items() if index < target)
+        return (below + self.bins.get(target, 0) / 2) / self.count
+
+
+class ScoreHistogram:
+    """Exact counts of integer scores from 0 to ``MAX_SCORE``."""
+
+    def __init__(self, counts: Optional[list[int]] = None) -> None:
+        self.counts = list(counts) if counts else [0] * (MAX_SCORE + 1)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def add(self, score: int, count: int = 1) -> None:
+        self.counts[min(max(int(score), 0), MAX_SCORE)] += count
+
+    def merge(self, other: "ScoreHistogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def quantile(self, q: float) -> Optional[int]:
+        total = self.count
+        if total <= 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for score, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return score
+        return MAX_SCORE
+
+    def rank(self, score: int) -> Optional[float]:
+        """Fraction of scores below ``score``, counting half of the ties."""
+        total = self.count
+        if total <= 0:
+            return None
+        score = min(max(int(score), 0), MAX_SCORE)
+        return (sum(self.counts[:score]) + self.counts[score] / 2) / total
+
+
+class AttemptSketch:
+    """Score histogram and time sketch for the attempts on one standard."""
+
+    def __init__(self) -> None:
+        self.score = ScoreHistogram()
+        self.time = LogSketch()
+
+    @property
+    def count(self) -> int:
+        return self.time.count
+
+    def add(self, score: int, time_seconds: int, count: int = 1) -> None:
+        self.score.add(score, count)
+        self.time.add(time_seconds, count)
+
+    def merge(self, other: "AttemptSketch") -> None:
+        self.score.merge(other.score)
+        self.time.merge(other.time)
+
+    def to_row(self) -> dict:
+        return {
+            "count": self.count,
+            "score_counts": self.score.counts,
+            "time_bins": {str(index): count for index, count in sorted(self.time.bins.items())},
+            "time_zero_count": self.time.zero_count,
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "AttemptSketch":
+        sketch = cls()
+        sketch.score = ScoreHistogram(row.score_counts)
+        sketch.time.bins = {int(index): count for index, count in (row.time_bins or {}).items()}
+        sketch.time.zero_count = row.time_zero_count or 0
+        sketch.time.count = sketch.time.zero_count + sum(sketch.time.bins.values())
+        return sketch
+
+
+Pending = dict[tuple[int, int], list[tuple[datetime, int, int]]]
+
+
+def _delta(entries: list[tuple[datetime, int, int]], rebuilt_at: Optional[datetime]) -> AttemptSketch:
+    """Sketch of the recorded ``(created_at, score, time_seconds)`` entries not yet in a rebuild."""
+    sketch = AttemptSketch()
+    for created_at, score, time_seconds in entries:
+        if rebuilt_at is None or created_at >= rebuilt_at:
+            sketch.add(score, time_seconds)
+    return sketch
+
+
+def _merge_into_rows(db: Session, pending: Pending) -> None:
+    """Add pending attempts to the stored rows, locking each row for the read-modify-write.
+
+    Standards deleted since their attempts were recorded are skipped (their
+    attempts no longer belong to any sketch); a row for one would violate the
+    foreign key and fail the whole flush on every retry.
+    """
+    now = datetime.utcnow()
+    # FOR SHARE keeps the standards from being deleted before this commits.
+    existing = set(
+        db.scalars(
+            select(models.TaskStandard.id)
+            .where(models.TaskStandard.id.in_({standard_id for _, standard_id in pending}))
+            .with_for_update(read=True)
+        )
+    )
+    for (task_id, standard_id), entries in sorted(pending.items()):
+        if standard_id not in existing:
+            continue
+        db.execute(
+            upsert_insert(sketch_table)
+            .values(task_id=task_id, standard_id=standard_id, updated_at=now, **AttemptSketch().to_row())
+            .on_conflict_do_nothing(index_elements=["standard_id"])
+        )
+        row = db.execute(
+            select(sketch_table).where(sketch_table.c.standard_id == standard_id).with_for_update()
+        ).one()
+        delta = _delta(entries, row.rebuilt_at)
+        if not delta.count:
+            continue
+        merged = AttemptSketch.from_row(row)
+        merged.merge(delta)
+        db.execute(
+            sketch_table.update()
+            .where(sketch_table.c.standard_id == standard_id)
+            .values(updated_at=now, **merged.to_row())
+        )
+
+
+def load_sketches(db: Session) -> tuple[dict[tuple[int, int], AttemptSketch], dict[tuple[int, int], datetime]]:
+    """Stored sketches, and the ``rebuilt_at`` of those that were rebuilt."""
+    sketches, rebuilt = {}, {}
+    for row in db.execute(select(sketch_table)):
+        sketches[(row.task_id, row.standard_id)] = AttemptSketch.from_row(row)
+        if row.rebuilt_at is not None:
+            rebuilt[(row.task_id, row.standard_id)] = row.rebuilt_at
+    return sketches, rebuilt
+
+
+class SketchStore:
+    """One worker's view of the sketches: the stored rows plus its own unflushed attempts."""
+
+    def __init__(self, flush_seconds: float = SKETCH_FLUSH_SECONDS) -> None:
+        self.flush_seconds = flush_seconds
+        self.loaded_at: Optional[float] = None
+        self._current: dict[tuple[int, int], AttemptSketch] = {}
+        self._pending: Pending = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, task_id: int, standard_id: int, score: int, time_seconds: int, created_at: datetime) -> None:
+        """Count a committed attempt; ``created_at`` is the attempt's own, which rebuilds compare against."""
+        key = (task_id, standard_id)
+        with self._lock:
+            self._current.setdefault(key, AttemptSketch()).add(score, time_seconds)
+            self._pending.setdefault(key, []).append((created_at, score, time_seconds))
+
+    def get(self, task_id: int, standard_id: int) -> Optional[AttemptSketch]:
+        return self._current.get((task_id, standard_id))
+
+    def for_task(self, task_id: int) -> dict[int, AttemptSketch]:
+        return {standard_id: sketch for (task, standard_id), sketch in list(self._current.items()) if task == task_id}
+
+    def score_rank(self, task_id: int, standard_id: int, score: int) -> Optional[float]:
+        """Percent of attempts on the standard that scored lower (ties count half)."""
+        sketch = self.get(task_id, standard_id)
+        rank = sketch.score.rank(score) if sketch is not None else None
+        return round(rank * 100, 1) if rank is not None else None
+
+    def sync(self) -> None:
+        """Merge this worker's pending attempts into the stored rows, then reload them."""
+        with self._sync_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            db = SessionLocal()
+            try:
+                if pending:
+                    try:
+                        _merge_into_rows(db, pending)
+                        db.commit()
+                    except Exception:
+                        db.rollback()
+                        with self._lock:
+                            for key, entries in pending.items():
+                                self._pending[key] = entries + self._pending.get(key, [])
+                        raise
+                stored, rebuilt = load_sketches(db)
+            finally:
+                db.close()
+            with self._lock:
+                for key, entries in self._pending.items():
+                    stored.setdefault(key, AttemptSketch()).merge(_delta(entries, rebuilt.get(key)))
+                self._current = stored
+                self.loaded_at = time.monotonic()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception as exc:  # keep the loop alive; pending attempts are retried next round
+                print(f"Sketch sync failed: {exc}")
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.sync)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.sync)
+
+
+def rebuild_sketches(db: Session, task_ids: list[int] | None = None) -> None:
+    """Recompute the stored sketches from the attempt history with two grouped queries.
+
+    Used to backfill existing databases and after bulk rescoring; the normal
+    write path keeps them current incrementally.
+    """
+    # Attempts created from this point on are left to the workers' deltas.
+    rebuilt_at = datetime.utcnow()
+    attempt = models.Attempt
+    sketches: dict[tuple[int, int], AttemptSketch] = {}
+    counted = or_(attempt.created_at < rebuilt_at, attempt.created_at.is_(None))
+    # Attempts whose standard was deleted keep a NULL standard_id and belong to no sketch.
+    score_query = (
+        select(attempt.task_id, attempt.standard_id, attempt.score, func.count())
+        .where(attempt.standard_id.is_not(None), counted)
+        .group_by(attempt.task_id, attempt.standard_id, attempt.score)
+    )
+    time_query = (
+        select(attempt.task_id, attempt.standard_id, attempt.time_seconds, func.count())
+        .where(attempt.standard_id.is_not(None), counted)
+        .group_by(attempt.task_id, attempt.standard_id, attempt.time_seconds)
+    )
+    clear = delete(sketch_table)
+    if task_ids is not None:
+        score_query = score_query.where(attempt.task_id.in_(task_ids))
+        time_query = time_query.where(attempt.task_id.in_(task_ids))
+        clear = clear.where(sketch_table.c.task_id.in_(task_ids))
+    for task_id, standard_id, score, count in db.execute(score_query):
+        sketches.setdefault((task_id, standard_id), AttemptSketch()).score.add(score, count)
+    for task_id, standard_id, seconds, count in db.execute(time_query):
+        sketches.setdefault((task_id, standard_id), AttemptSketch()).time.add(seconds, count)
+
+    db.execute(clear)
+    if sketches:
+        db.execute(
+            insert(sketch_table),
+            [
+                {
+                    "task_id": task_id,
+                    "standard_id": standard_id,
+                    "rebuilt_at": rebuilt_at,
+                    "updated_at": rebuilt_at,
+                    **sketch.to_row(),
+                }
+                for (task_id, standard_id), sketch in sketches.items()
+            ],
+        )
+
+
+def ensure_sketches(db: Session) -> None:
+    """Backfill ``task_sketches`` once for databases that predate the table."""
+    if db.query(models.TaskSketch.id).first() is None and db.query(models.Attempt.id).first() is not None:
+        rebuild_sketches(db)
+        db.commit()
+
+
+sketch_store = SketchStore()
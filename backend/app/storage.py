@@ -0,0 +1,89 @@
+"""Local video storage: chunked, checksummed writes that never buffer a whole upload."""
+import hashlib
+import os
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+VIDEO_DIR = os.getenv("VIDEO_STORAGE_DIR", "videos")
+MAX_VIDEO_BYTES = int(os.getenv("MAX_VIDEO_UPLOAD_BYTES", str(2 * 1024**3)))
+CHUNK_SIZE = 1024 * 1024
+# When set (e.g. "/protected-videos/"), playback hands the file to the fronting
+# nginx via X-Accel-Redirect so it is served with sendfile and native Range support.
+VIDEO_ACCEL_REDIRECT_PREFIX = os.getenv("VIDEO_ACCEL_REDIRECT_PREFIX")
+
+
+def video_path(attempt_id: int, filename: Optional[str], prefix: str = "") -> str:
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    name = os.path.basename(filename or "") or "video"
+    return os.path.join(VIDEO_DIR, f"{prefix}{attempt_id}_{name}")
+
+
+def too_large(limit: int = MAX_VIDEO_BYTES) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Upload exceeds the {limit} byte limit",
+    )
+
+
+class ChunkWriter:
+    """Append an async stream of chunks to a file without buffering it in memory.
+
+    Disk writes run on the threadpool so the event loop keeps serving other
+    requests, and ``digest`` (a hashlib object) is fed each chunk as it
+    arrives. ``offset`` always reflects the bytes persisted so far, including
+    after the source stream fails part way (e.g. a client disconnect), which
+    is what resumable uploads record. Resuming at a non-zero offset requires
+    the file to exist; it is never recreated and padded.
+    """
+
+    def __init__(self, path: str, offset: int = 0, limit: int = MAX_VIDEO_BYTES, digest=None) -> None:
+        self.path = path
+        self.offset = offset
+        self.limit = limit
+        self.digest = digest
+
+    async def write_from(self, chunks: AsyncIterator[bytes]) -> int:
+        mode = "r+b" if self.offset else "wb"
+        f = await run_in_threadpool(open, self.path, mode)
+        try:
+            # Drop any tail left by an interrupted write that was never acknowledged.
+            await run_in_threadpool(f.truncate, self.offset)
+            await run_in_threadpool(f.seek, self.offset)
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if self.offset + len(chunk) > self.limit:
+                    raise too_large(self.limit)
+                await run_in_threadpool(f.write, chunk)
+                if self.digest is not None:
+                    self.digest.update(chunk)
+                self.offset += len(chunk)
+        finally:
+            await run_in_threadpool(f.close)
+        return self.offset
+
+
+async def iter_upload_file(file) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def stored_bytes(path: str) -> int:
+    """Size of the file at ``path``, or 0 if it is missing."""
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,205 @@
+"""Maintenance of ``proficiency_streaks``, the per-standard consecutive-proficiency state."""
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import upsert_insert
+
+streak_table = models.ProficiencyStreak.__table__
+
+
+@dataclass(frozen=True)
+class _Run:
+    """How an ordered sequence of attempts changes a streak, whatever the stored state."""
+
+    length: int
+    lead: int  # proficient attempts before the first miss; extends the stored run
+    trail: int  # proficient attempts after the last miss; the new current run
+    inner_best: int  # longest run after the first miss
+
+    @property
+    def unbroken(self) -> bool:
+        return self.lead == self.length
+
+
+def _fold(flags: list[bool]) -> _Run:
+    lead = 0
+    while lead < len(flags) and flags[lead]:
+        lead += 1
+    if lead == len(flags):
+        return _Run(len(flags), lead, lead, 0)
+    run = inner_best = 0
+    for proficient in flags[lead:]:
+        run = run + 1 if proficient else 0
+        inner_best = max(inner_best, run)
+    return _Run(len(flags), lead, run, inner_best)
+
+
+def streak_upsert(
+    user_id: int,
+    task_id: int,
+    standard_id: int,
+    consecutive_required: int,
+    flags: list[bool],
+    attempt_id: int,
+    at: datetime,
+):
+    """Build an upsert applying ``flags`` (proficiency of new attempts, oldest first).
+
+    The new run lengths are computed from the stored row inside the statement
+    (``CASE`` over the current values), so concurrent writers for the same user
+    and standard serialize on the row instead of overwriting each other.
+    """
+    run = _fold(flags)
+    required = max(consecutive_required or 1, 1)
+    current = streak_table.c.current_run
+    best = streak_table.c.best_run
+    achieved_at = streak_table.c.achieved_at
+
+    extended = current + run.lead
+    if run.unbroken:
+        new_current = extended
+        peak = extended
+    else:
+        new_current = run.trail
+        peak = case((extended > run.inner_best, extended), else_=run.inner_best)
+    fresh_best = run.length if run.unbroken else max(run.lead, run.inner_best)
+
+    stmt = upsert_insert(streak_table).values(
+        user_id=user_id,
+        task_id=task_id,
+        standard_id=standard_id,
+        consecutive_required=required,
+        current_run=run.trail,
+        best_run=fresh_best,
+        achieved_at=at if fresh_best >= required else None,
+        last_attempt_id=attempt_id,
+        updated_at=at,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "standard_id"],
+        set_={
+            "current_run": new_current,
+            "best_run": case((peak > best, peak), else_=best),
+            "achieved_at": case(
+                (and_(achieved_at.is_(None), or_(peak >= required, best >= required)), at),
+                else_=achieved_at,
+            ),
+            "consecutive_required": required,
+            "last_attempt_id": attempt_id,
+            "updated_at": at,
+        },
+    )
+
+
+def record_streaks(db: Session, rows: list[dict]) -> None:
+    """Fold new attempts into their streaks with one statement per user and standard.
+
+    ``rows`` carry ``user_id``, ``task_id``, ``standard_id``,
+    ``consecutive_required``, ``attempt_id``, ``proficiency`` and
+    ``created_at``, in the order the attempts were logged.
+    """
+    groups: dict[tuple[int, int], list[dict]] = {}
+    for row in rows:
+        groups.setdefault((row["user_id"], row["standard_id"]), []).append(row)
+    for (user_id, standard_id), group in groups.items():
+        last = group[-1]
+        db.execute(
+            streak_upsert(
+                user_id,
+                last["task_id"],
+                standard_id,
+                last["consecutive_required"],
+                [bool(row["proficiency"]) for row in group],
+                last["attempt_id"],
+                last["created_at"],
+            )
+        )
+
+
+def record_streak(db: Session, attempt: models.Attempt, consecutive_required: int) -> None:
+    record_streaks(
+        db,
+        [
+            {
+                "user_id": attempt.user_id,
+                "task_id": attempt.task_id,
+                "standard_id": attempt.standard_id,
+                "consecutive_required": consecutive_required,
+                "attempt_id": attempt.id,
+                "proficiency": attempt.proficiency,
+                "created_at": attempt.created_at,
+            }
+        ],
+    )
+
+
+def rebuild_streaks(db: Session, task_ids: list[int] | None = None, chunk_size: int = 5000) -> None:
+    """Recompute streaks from the raw attempt history in one ordered pass.
+
+    Used to backfill existing databases and after bulk rescoring; the normal
+    write path keeps the table current incrementally.
+    """
+    query = (
+        select(
+            models.Attempt.user_id,
+            models.Attempt.task_id,
+            models.Attempt.standard_id,
+            models.Attempt.id,
+            models.Attempt.proficiency,
+            models.Attempt.created_at,
+            func.coalesce(models.TaskStandard.consecutive_required, 1).label("consecutive_required"),
+        )
+        .join(models.TaskStandard, models.TaskStandard.id == models.Attempt.standard_id)
+        .order_by(
+            models.Attempt.user_id,
+            models.Attempt.standard_id,
+            models.Attempt.created_at,
+            models.Attempt.id,
+        )
+    )
+    clear = delete(streak_table)
+    if task_ids is not None:
+        query = query.where(models.Attempt.task_id.in_(task_ids))
+        clear = clear.where(streak_table.c.task_id.in_(task_ids))
+    db.execute(clear)
+
+    now = datetime.utcnow()
+    pending: list[dict] = []
+    state = None
+    for row in db.execute(query.execution_options(yield_per=chunk_size)):
+        if state is None or (state["user_id"], state["standard_id"]) != (row.user_id, row.standard_id):
+            if state is not None:
+                pending.append(state)
+            state = {
+                "user_id": row.user_id,
+                "task_id": row.task_id,
+                "standard_id": row.standard_id,
+                "consecutive_required": max(row.consecutive_required, 1),
+                "current_run": 0,
+                "best_run": 0,
+                "achieved_at": None,
+                "updated_at": now,
+            }
+        state["current_run"] = state["current_run"] + 1 if row.proficiency else 0
+        state["best_run"] = max(state["best_run"], state["current_run"])
+        if state["achieved_at"] is None and state["current_run"] >= state["consecutive_required"]:
+            state["achieved_at"] = row.created_at
+        state["last_attempt_id"] = row.id
+        if len(pending) >= chunk_size:
+            db.execute(insert(streak_table), pending)
+            pending = []
+    if state is not None:
+        pending.append(state)
+    if pending:
+        db.execute(insert(streak_table), pending)
+
+
+def ensure_streaks(db: Session) -> None:
+    """Backfill ``proficiency_streaks`` once for databases that predate the table."""
+    if db.query(models.ProficiencyStreak.id).first() is None and db.query(models.Attempt.id).first() is not None:
+        rebuild_streaks(db)
+        db.commit()
@@ -0,0 +1,289 @@
+"""Maintenance of the per-team rollups (``team_task_stats`` and ``team_task_times``).
+
+Every attempt write adds its counts to each team the user belongs to, and a
+membership change adds or subtracts that member's whole history, so team
+summaries and medians read only the rollup rows.
+
+Both paths lock the user's row first. Without that, under READ COMMITTED an
+attempt committed while its user joins a team could be missed by both (the
+attempt write saw no membership, the join summed history without the
+attempt) or counted by both.
+"""
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import upsert_insert
+
+stats_table = models.TeamTaskStats.__table__
+times_table = models.TeamTaskTime.__table__
+
+STAT_FIELDS = ("attempts", "proficient_attempts", "time_seconds_sum", "score_sum")
+
+
+def _totals(rows: list[dict]) -> tuple[dict[int, Counter], Counter]:
+    """Sum attempt rows into per-task stat counters and a ``(task_id, time_seconds)`` histogram."""
+    stats: dict[int, Counter] = {}
+    times: Counter = Counter()
+    for row in rows:
+        counter = stats.setdefault(row["task_id"], Counter())
+        counter["attempts"] += 1
+        counter["proficient_attempts"] += int(bool(row["proficiency"]))
+        counter["time_seconds_sum"] += row["time_seconds"]
+        counter["score_sum"] += row["score"]
+        times[(row["task_id"], row["time_seconds"])] += 1
+    return stats, times
+
+
+def _apply(db: Session, team_ids: list[int], stats: dict[int, Counter], times: Counter, sign: int = 1) -> None:
+    """Add (or with ``sign=-1`` subtract) totals to the rollups of every team in ``team_ids``.
+
+    Increments happen inside the upsert, so concurrent writers for the same
+    team and task add up instead of overwriting each other.
+    """
+    if not team_ids or not stats:
+        return
+    now = datetime.utcnow()
+    stmt = upsert_insert(stats_table).values(
+        [
+            {
+                "team_id": team_id,
+                "task_id": task_id,
+                **{field: sign * counter[field] for field in STAT_FIELDS},
+                "updated_at": now,
+            }
+            for team_id in team_ids
+            for task_id, counter in sorted(stats.items())
+        ]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["team_id", "task_id"],
+            set_={
+                **{field: stats_table.c[field] + stmt.excluded[field] for field in STAT_FIELDS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+    )
+    stmt = upsert_insert(times_table).values(
+        [
+            {"team_id": team_id, "task_id": task_id, "time_seconds": seconds, "count": sign * count}
+            for team_id in team_ids
+            for (task_id, seconds), count in sorted(times.items())
+        ]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["team_id", "task_id", "time_seconds"],
+            set_={"count": times_table.c.count + stmt.excluded.count},
+        )
+    )
+    if sign < 0:
+        task_ids = list(stats)
+        db.execute(
+            delete(times_table).where(
+                times_table.c.team_id.in_(team_ids),
+                times_table.c.task_id.in_(task_ids),
+                times_table.c.count <= 0,
+            )
+        )
+        db.execute(
+            delete(stats_table).where(
+                stats_table.c.team_id.in_(team_ids),
+                stats_table.c.task_id.in_(task_ids),
+                stats_table.c.attempts <= 0,
+            )
+        )
+
+
+def _lock_users(db: Session, user_ids) -> None:
+    """Serialise rollup updates per user; sorted to keep lock order deadlock free.
+
+    ``FOR NO KEY UPDATE`` does not block the key-share locks taken by inserts
+    that reference the user. SQLite ignores it but already serialises writers.
+    """
+    db.execute(
+        select(models.User.id)
+        .where(models.User.id.in_(sorted(user_ids)))
+        .order_by(models.User.id)
+        .with_for_update(key_share=True)
+    ).all()
+
+
+def record_team_stats(db: Session, rows: list[dict]) -> None:
+    """Fold new attempts into the rollups of their users' teams.
+
+    ``rows`` carry ``user_id``, ``task_id``, ``time_seconds``, ``score`` and
+    ``proficiency``. Users in no team cost a single indexed membership lookup.
+    """
+    user_ids = {row["user_id"] for row in rows}
+    _lock_users(db, user_ids)
+    teams_by_user: dict[int, list[int]] = {}
+    for user_id, team_id in db.execute(
+        select(models.TeamMembership.user_id, models.TeamMembership.team_id).where(
+            models.TeamMembership.user_id.in_(user_ids)
+        )
+    ):
+        teams_by_user.setdefault(user_id, []).append(team_id)
+    for user_id, team_ids in teams_by_user.items():
+        stats, times = _totals([row for row in rows if row["user_id"] == user_id])
+        _apply(db, sorted(team_ids), stats, times)
+
+
+def record_team_stat(db: Session, attempt: models.Attempt) -> None:
+    record_team_stats(
+        db,
+        [
+            {
+                "user_id": attempt.user_id,
+                "task_id": attempt.task_id,
+                "time_seconds": attempt.time_seconds,
+                "score": attempt.score,
+                "proficiency": attempt.proficiency,
+            }
+        ],
+    )
+
+
+def _member_totals(db: Session, user_id: int) -> tuple[dict[int, Counter], Counter]:
+    """The member's history summed per task and per duration, with two grouped queries."""
+    attempt = models.Attempt
+    stats = {
+        row.task_id: Counter(
+            attempts=row.attempts,
+            proficient_attempts=row.proficient_attempts or 0,
+            time_seconds_sum=row.time_seconds_sum or 0,
+            score_sum=row.score_sum or 0,
+        )
+        for row in db.execute(
+            select(
+                attempt.task_id,
+                func.count().label("attempts"),
+                func.sum(case((attempt.proficiency, 1), else_=0)).label("proficient_attempts"),
+                func.sum(attempt.time_seconds).label("time_seconds_sum"),
+                func.sum(attempt.score).label("score_sum"),
+            )
+            .where(attempt.user_id == user_id)
+            .group_by(attempt.task_id)
+        )
+    }
+    times = Counter(
+        {
+            (row.task_id, row.time_seconds): row.count
+            for row in db.execute(
+                select(attempt.task_id, attempt.time_seconds, func.count().label("count"))
+                .where(attempt.user_id == user_id)
+                .group_by(attempt.task_id, attempt.time_seconds)
+            )
+        }
+    )
+    return stats, times
+
+
+def add_member(db: Session, team_id: int, user_id: int) -> None:
+    """Add the membership and the member's history to the team rollups; no-op if already a member."""
+    _lock_users(db, [user_id])
+    inserted = db.execute(
+        upsert_insert(models.TeamMembership.__table__)
+        .values(team_id=team_id, user_id=user_id, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["team_id", "user_id"])
+        .returning(models.TeamMembership.__table__.c.id)
+    ).first()
+    if inserted is None:
+        return
+    stats, times = _member_totals(db, user_id)
+    _apply(db, [team_id], stats, times)
+
+
+def remove_member(db: Session, team_id: int, user_id: int) -> bool:
+    """Remove the membership and subtract the member's history; False if not a member."""
+    _lock_users(db, [user_id])
+    deleted = db.execute(
+        delete(models.TeamMembership.__table__)
+        .where(models.TeamMembership.team_id == team_id, models.TeamMembership.user_id == user_id)
+        .returning(models.TeamMembership.__table__.c.id)
+    ).first()
+    if deleted is None:
+        return False
+    stats, times = _member_totals(db, user_id)
+    _apply(db, [team_id], stats, times, sign=-1)
+    return True
+
+
+def median_time(histogram: list[tuple[int, int]]) -> float | None:
+    """Median of a ``(time_seconds, count)`` histogram sorted by time."""
+    total = sum(count for _, count in histogram)
+    if total <= 0:
+        return None
+    lower_rank, upper_rank = (total - 1) // 2, total // 2
+    lower = upper = None
+    seen = 0
+    for seconds, count in histogram:
+        seen += count
+        if lower is None and seen > lower_rank:
+            lower = seconds
+        if seen > upper_rank:
+            upper = seconds
+            break
+    return (lower + upper) / 2
+
+
+def rebuild_team_stats(db: Session, task_ids: list[int] | None = None) -> None:
+    """Recompute the team rollups from memberships and the raw attempt history.
+
+    Used to backfill existing databases and after bulk rescoring; the normal
+    write path keeps the tables current incrementally.
+    """
+    attempt = models.Attempt
+    membership = models.TeamMembership
+    clear_stats = delete(stats_table)
+    clear_times = delete(times_table)
+    filters = []
+    if task_ids is not None:
+        filters.append(attempt.task_id.in_(task_ids))
+        clear_stats = clear_stats.where(stats_table.c.task_id.in_(task_ids))
+        clear_times = clear_times.where(times_table.c.task_id.in_(task_ids))
+    db.execute(clear_stats)
+    db.execute(clear_times)
+
+    db.execute(
+        insert(stats_table).from_select(
+            ["team_id", "task_id", *STAT_FIELDS, "updated_at"],
+            select(
+                membership.team_id,
+                attempt.task_id,
+                func.count(),
+                func.sum(case((attempt.proficiency, 1), else_=0)),
+                func.sum(attempt.time_seconds),
+                func.sum(attempt.score),
+                func.current_timestamp(),
+            )
+            .join(membership, membership.user_id == attempt.user_id)
+            .where(*filters)
+            .group_by(membership.team_id, attempt.task_id),
+        )
+    )
+    db.execute(
+        insert(times_table).from_select(
+            ["team_id", "task_id", "time_seconds", "count"],
+            select(
+                membership.team_id,
+                attempt.task_id,
+                attempt.time_seconds,
+                func.count(),
+            )
+            .join(membership, membership.user_id == attempt.user_id)
+            .where(*filters)
+            .group_by(membership.team_id, attempt.task_id, attempt.time_seconds),
+        )
+    )
+
+
+def ensure_team_stats(db: Session) -> None:
+    """Backfill the team rollups once for databases that predate the tables."""
+    if db.query(models.TeamTaskStats.id).first() is None and db.query(models.TeamMembership.id).first() is not None:
+        rebuild_team_stats(db)
+        db.commit()
@@ -0,0 +1,213 @@
+"""Background worker that analyses attempt videos queued in ``analysis_jobs``.
+
+Run alongside the API, as many copies as the hardware allows::
+
+    python -m app.worker --processes 2
+
+Each process loads the model once, then repeatedly claims one job, samples
+``ANALYSIS_FRAMES`` frames spread evenly across the video, classifies them in
+batches and stores the result. Failures are retried with backoff (see
+``app.jobs``). Database errors roll back and are retried with growing pauses
+instead of stopping the worker. SIGTERM/SIGINT finish the current job before
+exiting.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+from . import models
+from .db import SessionLocal
+from .inference import (
+    INFERENCE_MODE,
+    class_names,
+    inference_available,
+    load_model,
+    predict_batch,
+    preprocess_frame,
+    supported_mode,
+)
+from .jobs import claim_jobs, complete_job, fail_job
+
+ANALYSIS_WORKER_PROCESSES = int(os.getenv("ANALYSIS_WORKER_PROCESSES", "1"))
+ANALYSIS_POLL_SECONDS = float(os.getenv("ANALYSIS_POLL_SECONDS", "2"))
+ANALYSIS_FRAMES = int(os.getenv("ANALYSIS_FRAMES", "16"))
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "16"))
+# torch threads per worker process; keep processes * threads <= cores.
+ANALYSIS_THREADS = int(os.getenv("ANALYSIS_THREADS", "0"))
+ANALYSIS_TOP_K = 5
+# Longest pause between retries while the database is unreachable.
+ANALYSIS_MAX_BACKOFF_SECONDS = float(os.getenv("ANALYSIS_MAX_BACKOFF_SECONDS", "60"))
+
+
+def sample_frames(path: str, count: int = ANALYSIS_FRAMES) -> list[tuple[float, np.ndarray]]:
+    """Decode ``count`` frames at evenly spaced timestamps, preprocessed for the model."""
+    import av
+
+    frames = []
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if stream.duration:
+            duration = float(stream.duration * stream.time_base)
+        elif container.duration:
+            duration = container.duration / av.time_base
+        else:
+            duration = None
+
+        if not duration:
+            # Unknown length (e.g. some webm): take keyframes, thinning as they accumulate.
+            stream.codec_context.skip_frame = "NONKEY"
+            for frame in container.decode(stream):
+                frames.append((frame.time or 0.0, preprocess_frame(frame.to_image())))
+                if len(frames) >= 2 * count:
+                    frames = frames[::2]
+            return frames[:: max(1, len(frames) // count)][:count]
+
+        start = float(stream.start_time * stream.time_base) if stream.start_time else 0.0
+        for i in range(count):
+            target = start + duration * (i + 0.5) / count
+            # Seeks land on the keyframe at or before the target; decode forward to it.
+            container.seek(int(target / stream.time_base), stream=stream)
+            for frame in container.decode(stream):
+                if frame.time is not None and frame.time < target:
+                    continue
+                frames.append((frame.time if frame.time is not None else target, preprocess_frame(frame.to_image())))
+                break
+    return frames
+
+
+def analyze_video(model, labels: list[str], path: str) -> tuple[int, dict]:
+    """Classify sampled frames; returns the frame count and the stored results document."""
+    frames = sample_frames(path)
+    if not frames:
+        raise ValueError("No decodable video frames")
+    timeline = []
+    probability_sums: dict[int, float] = defaultdict(float)
+    for start in range(0, len(frames), ANALYSIS_BATCH_SIZE):
+        chunk = frames[start:start + ANALYSIS_BATCH_SIZE]
+        probabilities, indices = predict_batch(model, np.stack([image for _, image in chunk]), ANALYSIS_TOP_K)
+        for (timestamp, _), probs, idxs in zip(chunk, probabilities, indices):
+            for p, i in zip(probs, idxs):
+                probability_sums[int(i)] += float(p)
+            timeline.append(
+                {
+                    "timestamp": round(timestamp, 3),
+                    "class_index": int(idxs[0]),
+                    "label": labels[idxs[0]],
+                    "probability": round(float(probs[0]), 6),
+                }
+            )
+    top_classes = sorted(probability_sums.items(), key=lambda item: item[1], reverse=True)[:ANALYSIS_TOP_K]
+    return len(frames), {
+        "top_classes": [
+            {"class_index": i, "label": labels[i], "mean_probability": round(total / len(frames), 6)}
+            for i, total in top_classes
+        ],
+        "frames": timeline,
+    }
+
+
+def _video_path(db, video_id: int) -> str:
+    video = db.get(models.Video, video_id)
+    if video is None:
+        raise LookupError(f"Video {video_id} not found")
+    return video.storage_url
+
+
+def run_worker(
+    worker_id: str, poll_seconds: float = ANALYSIS_POLL_SECONDS, once: bool = False, mode: str = INFERENCE_MODE
+) -> None:
+    stopping = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    mode = supported_mode(mode)
+    model = load_model(ANALYSIS_THREADS, mode)
+    labels = class_names()
+    print(f"Analysis worker {worker_id} ready (mode {mode})", flush=True)
+
+    backoff = max(poll_seconds, 1.0)
+    while not stopping.is_set():
+        db = SessionLocal()
+        try:
+            claimed = _run_one(db, model, mode, labels, worker_id)
+            backoff = max(poll_seconds, 1.0)
+            if not claimed:
+                if once:
+                    return
+                stopping.wait(poll_seconds)
+        except Exception as exc:
+            # Lost connection, lock timeout and the like: the lease protects
+            # any job we held, so roll back, wait and try again.
+            db.rollback()
+            print(f"Worker {worker_id} database error, retrying in {backoff:.0f}s: {exc}", flush=True)
+            stopping.wait(backoff)
+            backoff = min(backoff * 2, ANALYSIS_MAX_BACKOFF_SECONDS)
+        finally:
+            db.close()
+
+
+def _run_one(db, model, mode: str, labels: list[str], worker_id: str) -> bool:
+    """Claim and process one job; False when the queue had nothing to claim."""
+    jobs = claim_jobs(db, worker_id)
+    if not jobs:
+        return False
+    job = jobs[0]
+    start = time.perf_counter()
+    try:
+        frames, results = analyze_video(model, labels, _video_path(db, job.video_id))
+    except Exception as exc:
+        db.rollback()
+        fail_job(db, job, worker_id, f"{type(exc).__name__}: {exc}")
+        print(f"Job {job.id} failed (attempt {job.attempts}/{job.max_attempts}): {exc}", flush=True)
+        return True
+    if complete_job(db, job, worker_id, frames, results, mode=mode):
+        print(f"Job {job.id} analysed {frames} frames in {time.perf_counter() - start:.1f}s", flush=True)
+    else:
+        print(f"Job {job.id} lease expired before completion; result discarded", flush=True)
+    return True
+
+
+def _worker_main(index: int, poll_seconds: float, once: bool) -> None:
+    run_worker(f"{socket.gethostname()}:{os.getpid()}:{index}", poll_seconds, once)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Analyse queued attempt videos.")
+    parser.add_argument("--processes", type=int, default=ANALYSIS_WORKER_PROCESSES)
+    parser.add_argument("--poll-seconds", type=float, default=ANALYSIS_POLL_SECONDS)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args(argv)
+
+    if not inference_available():
+        sys.exit("Install requirements-inference.txt to run the analysis worker")
+    if args.processes <= 1:
+        _worker_main(0, args.poll_seconds, args.once)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_main, args=(index, args.poll_seconds, args.once), daemon=False)
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Children get their own handlers: Ctrl-C reaches the whole process group,
+    # and SIGTERM sent to this parent is forwarded. Either way, wait for them.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes if p.is_alive()])
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Shared fixtures: a throwaway SQLite database, a small catalog and an API client.
+
+Run from ``backend/`` with ``python -m pytest``.
+"""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+_tmp_dir = tempfile.mkdtemp(prefix="surgitrack-tests-")
+# The engines are built at import time, so configure them before importing the app.
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/test.db"
+os.environ["VIDEO_STORAGE_DIR"] = os.path.join(_tmp_dir, "videos")
+os.environ["BOOTSTRAP_ON_STARTUP"] = "false"
+os.environ["INFERENCE_ON_STARTUP"] = "false"
+os.environ["RESCORE_ON_STARTUP"] = "false"
+os.environ["ADMIN_EMAILS"] = "admin@example.com"
+os.environ["BCRYPT_ROUNDS"] = "4"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.analytics import curve_cache  # noqa: E402
+from app.catalog import catalog  # noqa: E402
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.security import user_cache  # noqa: E402
+from app.sketches import sketch_store  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    catalog.invalidate()
+    curve_cache._entries.clear()
+    user_cache._entries.clear()
+    sketch_store._current, sketch_store._pending = {}, {}
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def catalog_rows(db):
+    """One task with two standards and one error type per severity."""
+    task = models.Task(name="Suturing", slug="suturing")
+    db.add(task)
+    db.flush()
+    easy = models.TaskStandard(
+        task_id=task.id,
+        level="PGY1",
+        target_time_seconds=60,
+        max_minor_errors=1,
+        max_major_errors=0,
+        consecutive_required=2,
+    )
+    hard = models.TaskStandard(
+        task_id=task.id,
+        level="PGY2",
+        target_time_seconds=40,
+        max_minor_errors=0,
+        max_major_errors=0,
+        consecutive_required=3,
+    )
+    errors = {
+        severity: models.ErrorType(name=f"{severity} error", severity=severity)
+        for severity in ("minor", "major", "critical")
+    }
+    db.add_all([easy, hard, *errors.values()])
+    db.commit()
+    return SimpleNamespace(task=task, easy=easy, hard=hard, errors=errors)
+
+
+@pytest.fixture
+def client(db):
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def auth_headers(client: TestClient, email: str) -> dict:
+    client.post("/auth/register", json={"email": email, "password": "secret-pw"})
+    token = client.post("/auth/login", data={"username": email, "password": "secret-pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def table_rows(db, model, ignore=("id", "updated_at")) -> list[tuple]:
+    """Every row of ``model``'s table as sorted tuples, for comparing against a rebuild."""
+    db.expire_all()
+    columns = [column for column in model.__table__.columns if column.name not in ignore]
+    return sorted(tuple(row) for row in db.execute(select(*columns)))
+
+
+def attempt_payload(task_id: int, standard_id: int, seconds: int, error_type_ids=(), start_minute: int = 0) -> dict:
+    started = f"2024-01-01T00:{start_minute:02d}:00"
+    ended_minute, ended_second = divmod(start_minute * 60 + seconds, 60)
+    hours, ended_minute = divmod(ended_minute, 60)
+    return {
+        "task_id": task_id,
+        "standard_id": standard_id,
+        "started_at": started,
+        "ended_at": f"2024-01-01T{hours:02d}:{ended_minute:02d}:{ended_second:02d}",
+        "errors": [{"error_type_id": error_id} for error_id in error_type_ids],
+    }
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from app.analytics import curve_cache, moving_average, plateau_start, reps_to_proficiency, run_lengths
+from conftest import attempt_payload, auth_headers
+
+
+def naive_moving_average(values, window):
+    averages = []
+    for i in range(len(values)):
+        trailing = values[max(i - window + 1, 0):i + 1]
+        averages.append(sum(trailing) / len(trailing))
+    return averages
+
+
+def naive_run_lengths(flags):
+    lengths, run = [], 0
+    for flag in flags:
+        run = run + 1 if flag else 0
+        lengths.append(run)
+    return lengths
+
+
+def naive_reps_to_proficiency(proficiency, consecutive_required):
+    run = 0
+    for rep, (proficient, required) in enumerate(zip(proficiency, consecutive_required), start=1):
+        run = run + 1 if proficient else 0
+        if run >= required:
+            return rep
+    return None
+
+
+def naive_plateau_start(score_average, window, tolerance):
+    if len(score_average) < 2 * window:
+        return None
+    # The plateau starts on the rep after the last one that still improved on a window earlier.
+    start = window + 1
+    for rep in range(window + 1, len(score_average) + 1):
+        if score_average[rep - 1] - score_average[rep - 1 - window] > tolerance:
+            start = rep + 1
+    return start if len(score_average) - start + 1 >= window else None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_vectorised_curves_match_naive_loops(seed):
+    rng = np.random.default_rng(seed)
+    length = int(rng.integers(0, 16))
+    scores = rng.integers(0, 101, length).astype(np.float64)
+    proficiency = rng.random(length) < 0.6
+    required = rng.integers(1, 4, length)
+
+    for window in (1, 2, 3, 5):
+        assert moving_average(scores, window) == pytest.approx(naive_moving_average(list(scores), window))
+        average = moving_average(scores, window)
+        for tolerance in (0.0, 5.0, 20.0):
+            assert plateau_start(average, window, tolerance) == naive_plateau_start(list(average), window, tolerance)
+    assert run_lengths(proficiency).tolist() == naive_run_lengths(proficiency)
+    assert reps_to_proficiency(proficiency, required) == naive_reps_to_proficiency(proficiency, required)
+
+
+def test_plateau_on_a_flattening_series():
+    average = moving_average(np.array([10, 20, 30, 40, 50, 60, 61, 61, 62, 61, 62, 62], dtype=np.float64), 2)
+    assert plateau_start(average, 2, 2.0) == naive_plateau_start(list(average), 2, 2.0) == 9
+
+
+def test_new_attempt_refreshes_the_cached_curve(client, catalog_rows):
+    headers = auth_headers(client, "a@example.com")
+    task, easy = catalog_rows.task.id, catalog_rows.easy.id
+    url = f"/analytics/learning-curve?task_id={task}&window=2"
+    client.post("/attempts/", json=attempt_payload(task, easy, 50), headers=headers)
+
+    first = client.get(url, headers=headers).json()
+    (key, (token, _)), = curve_cache._entries.items()
+    assert client.get(url, headers=headers).json() == first
+
+    client.post("/attempts/", json=attempt_payload(task, easy, 30, start_minute=2), headers=headers)
+    second = client.get(url, headers=headers).json()
+
+    assert curve_cache._entries[key][0] != token
+    assert (first["attempts"], second["attempts"]) == (1, 2)
+    assert [point["time_moving_avg"] for point in second["points"]] == [50.0, 40.0]
@@ -0,0 +1,33 @@
+from app.catalog import catalog
+
+
+def test_if_none_match_returns_304_until_the_catalog_changes(client, db, catalog_rows):
+    first = client.get("/tasks/")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.json()[0]["name"] == "Suturing"
+
+    cached = client.get("/tasks/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert client.get("/tasks/", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    catalog_rows.task.name = "Interrupted suturing"
+    db.commit()
+    # The snapshot is only rebuilt after invalidate().
+    assert client.get("/tasks/", headers={"If-None-Match": etag}).status_code == 304
+    catalog.invalidate()
+
+    fresh = client.get("/tasks/", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert fresh.json()[0]["name"] == "Interrupted suturing"
+
+
+def test_per_task_and_error_type_bodies_carry_etags(client, catalog_rows):
+    for url in ("/tasks/suturing", f"/tasks/{catalog_rows.task.id}/standards", "/error-types/"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.get("/tasks/missing").status_code == 404
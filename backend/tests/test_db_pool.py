@@ -0,0 +1,51 @@
+import inspect
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.db import TimedQueuePool, _TimedCheckout
+
+
+def _pool(connect_delay=0.0):
+    def connect():
+        time.sleep(connect_delay)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    return TimedQueuePool(connect, pool_size=1, max_overflow=0, timeout=5)
+
+
+def test_wait_excludes_connect_time():
+    pool = _pool(connect_delay=0.2)
+    pool.connect().close()
+    pool.connect().close()
+
+    stats = pool.wait_stats.snapshot()
+    assert stats["checkouts"] == 2
+    assert stats["max_wait_seconds"] < 0.1
+
+
+def test_wait_counts_time_blocked_on_an_exhausted_pool():
+    pool = _pool()
+    held = pool.connect()
+    releaser = threading.Timer(0.2, held.close)
+    releaser.start()
+    pool.connect().close()
+    releaser.join()
+
+    stats = pool.wait_stats.snapshot()
+    assert stats["checkouts"] == 2
+    assert stats["max_wait_seconds"] >= 0.15
+
+
+@pytest.mark.parametrize("base", [QueuePool, AsyncAdaptedQueuePool])
+@pytest.mark.parametrize("name", ["_create_connection", "_do_get", "_do_return_conn", "recreate"])
+def test_overridden_pool_methods_still_exist(base, name):
+    # _TimedCheckout hooks private SQLAlchemy methods; a release that renames
+    # or re-signs one would silently stop the stats (requirements.txt pins it).
+    assert callable(getattr(base, name, None))
+    assert list(inspect.signature(getattr(base, name)).parameters) == list(
+        inspect.signature(getattr(_TimedCheckout, name)).parameters
+    )
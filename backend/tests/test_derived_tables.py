@@ -0,0 +1,80 @@
+"""The incrementally maintained tables must equal a rebuild from the raw attempts."""
+import random
+
+import pytest
+
+from app import models
+from app.best_attempts import rebuild_best_attempts
+from app.rescoring import queue_rescore, run_rescore_job
+from app.scoring import score_attempt
+from app.sketches import rebuild_sketches, sketch_store
+from app.streaks import rebuild_streaks
+from conftest import attempt_payload, auth_headers, table_rows
+
+SNAPSHOTS = {
+    "best_attempts": (models.BestAttempt, rebuild_best_attempts),
+    "streaks": (models.ProficiencyStreak, rebuild_streaks),
+    "sketches": (models.TaskSketch, rebuild_sketches),
+}
+
+
+def _snapshot(db, model):
+    return table_rows(db, model, ignore=("id", "updated_at", "rebuilt_at"))
+
+
+def _record_history(client, catalog_rows, seed=7):
+    """Single and batch posts for three users, mixing proficient and failed attempts."""
+    rng = random.Random(seed)
+    task = catalog_rows.task.id
+    standards = (catalog_rows.easy.id, catalog_rows.hard.id)
+    error_ids = [None, catalog_rows.errors["minor"].id, catalog_rows.errors["major"].id]
+
+    def payload(minute):
+        errors = [e for e in (rng.choice(error_ids),) if e is not None]
+        return attempt_payload(task, rng.choice(standards), rng.choice((30, 40, 55, 70, 120)), errors, minute)
+
+    for email in ("a@example.com", "b@example.com", "c@example.com"):
+        headers = auth_headers(client, email)
+        for minute in range(6):
+            assert client.post("/attempts/", json=payload(minute), headers=headers).status_code == 201
+        batch = [payload(minute) for minute in range(6, 15)]
+        assert client.post("/attempts/batch", json={"attempts": batch}, headers=headers).status_code == 201
+    sketch_store.sync()
+
+
+@pytest.mark.parametrize("name", sorted(SNAPSHOTS))
+def test_incremental_table_matches_rebuild(client, db, catalog_rows, name):
+    model, rebuild = SNAPSHOTS[name]
+    _record_history(client, catalog_rows)
+    incremental = _snapshot(db, model)
+    assert incremental
+
+    rebuild(db)
+    db.commit()
+    assert _snapshot(db, model) == incremental
+
+
+def test_chunked_rescore_matches_fresh_scoring(client, db, catalog_rows):
+    _record_history(client, catalog_rows)
+    easy = db.get(models.TaskStandard, catalog_rows.easy.id)
+    easy.target_time_seconds = 35
+    easy.max_minor_errors = 0
+    queue_rescore(db, [easy.id], reason="test")
+    db.commit()
+
+    job = db.query(models.RescoreJob).one()
+    run_rescore_job(db, job, chunk_size=4, log=None)
+
+    db.expire_all()
+    assert job.status == "done"
+    assert job.updated > 0
+    assert job.processed == job.total == db.query(models.Attempt).filter_by(standard_id=easy.id).count()
+    for attempt in db.query(models.Attempt).filter_by(standard_id=easy.id):
+        errors = [error.error_type for error in attempt.errors]
+        assert (attempt.score, attempt.proficiency) == score_attempt(attempt.time_seconds, easy, errors)
+
+    derived = {name: _snapshot(db, model) for name, (model, _) in SNAPSHOTS.items()}
+    for name, (model, rebuild) in SNAPSHOTS.items():
+        rebuild(db)
+        db.commit()
+        assert _snapshot(db, model) == derived[name], name
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app import models
+from app.exports import COLUMNS, export_chunks, export_query
+from conftest import attempt_payload, auth_headers
+
+SEVERITY_COLUMNS = ["minor_errors", "major_errors", "critical_errors", "error_count"]
+
+
+@pytest.fixture
+def history(client, db, catalog_rows):
+    """Three attempts across two tasks, two residents (one on a team) and two days."""
+    admin = auth_headers(client, "admin@example.com")
+    a = auth_headers(client, "a@example.com")
+    b = auth_headers(client, "b@example.com")
+    knots = models.Task(name="Knot tying", slug="knot-tying")
+    db.add(knots)
+    db.flush()
+    knots_standard = models.TaskStandard(task_id=knots.id, level="PGY1", target_time_seconds=30)
+    db.add(knots_standard)
+    db.commit()
+
+    errors = catalog_rows.errors
+    task, easy = catalog_rows.task.id, catalog_rows.easy.id
+    all_severities = [errors["minor"].id, errors["major"].id, errors["critical"].id]
+    ids = [
+        client.post("/attempts/", json=attempt_payload(task, easy, 50, all_severities), headers=a).json()["id"],
+        client.post("/attempts/", json=attempt_payload(task, easy, 45, [errors["minor"].id], 2), headers=b).json()["id"],
+        client.post("/attempts/", json=attempt_payload(knots.id, knots_standard.id, 20), headers=a).json()["id"],
+    ]
+    for attempt_id, created_at in zip(ids, (datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 2, 12))):
+        db.get(models.Attempt, attempt_id).created_at = created_at
+    db.commit()
+
+    team = client.post("/teams/", json={"name": "Red"}, headers=admin).json()["id"]
+    a_id = db.query(models.User.id).filter(models.User.email == "a@example.com").scalar()
+    client.put(f"/teams/{team}/members/{a_id}", headers=admin)
+    return {"admin": admin, "resident": a, "ids": ids, "task_id": task, "team_id": team}
+
+
+def _csv_rows(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+
+def _ndjson_rows(response):
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_csv_and_ndjson_carry_per_severity_error_counts(client, history):
+    csv_rows = _csv_rows(client.get("/admin/exports/attempts?format=csv", headers=history["admin"]))
+    ndjson_rows = _ndjson_rows(client.get("/admin/exports/attempts?format=ndjson", headers=history["admin"]))
+
+    assert list(csv_rows[0]) == list(COLUMNS)
+    assert [int(row["attempt_id"]) for row in csv_rows] == history["ids"]
+    assert [[int(row[name]) for name in SEVERITY_COLUMNS] for row in csv_rows] == [
+        [1, 1, 1, 3],
+        [1, 0, 0, 1],
+        [0, 0, 0, 0],
+    ]
+    assert [{name: row[name] for name in SEVERITY_COLUMNS} for row in ndjson_rows] == [
+        {name: int(row[name]) for name in SEVERITY_COLUMNS} for row in csv_rows
+    ]
+    assert ndjson_rows[0]["user_email"] == "a@example.com"
+    assert ndjson_rows[0]["created_at"] == "2024-01-01T00:00:00"
+
+
+@pytest.mark.parametrize(
+    "params, expected",
+    [
+        ("task_id={task_id}", [0, 1]),
+        ("since=2024-01-02T00:00:00", [1, 2]),
+        ("until=2024-01-02T00:00:00", [0]),
+        ("since=2024-01-02T00:00:00&until=2024-01-02T06:00:00", [1]),
+        ("team_id={team_id}", [0, 2]),
+        ("team_id={team_id}&task_id={task_id}", [0]),
+    ],
+)
+def test_filters(client, history, params, expected):
+    query = params.format(**history)
+    expected_ids = [history["ids"][i] for i in expected]
+
+    csv_rows = _csv_rows(client.get(f"/admin/exports/attempts?format=csv&{query}", headers=history["admin"]))
+    ndjson_rows = _ndjson_rows(client.get(f"/admin/exports/attempts?format=ndjson&{query}", headers=history["admin"]))
+
+    assert [int(row["attempt_id"]) for row in csv_rows] == expected_ids
+    assert [row["attempt_id"] for row in ndjson_rows] == expected_ids
+
+
+def test_non_admin_is_forbidden(client, history):
+    for fmt in ("csv", "ndjson"):
+        response = client.get(f"/admin/exports/attempts?format={fmt}", headers=history["resident"])
+        assert response.status_code == 403
+    assert client.get("/admin/exports/attempts").status_code == 401
+
+
+def test_csv_header_is_written_once_across_partitions(history):
+    body = b"".join(export_chunks("csv", export_query(), chunk_size=1)).decode()
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0] == list(COLUMNS)
+    assert [int(row[0]) for row in rows[1:]] == history["ids"]
+
+
+def test_parquet_round_trip(client, history):
+    pq = pytest.importorskip("pyarrow.parquet")
+    response = client.get("/admin/exports/attempts?format=parquet", headers=history["admin"])
+    assert response.status_code == 200
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == list(COLUMNS)
+    assert table.column("attempt_id").to_pylist() == history["ids"]
+    assert table.column("critical_errors").to_pylist() == [1, 0, 0]
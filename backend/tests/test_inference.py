@@ -0,0 +1,21 @@
+import pytest
+
+from app.inference import INFERENCE_MODES, InferenceService, supported_mode
+
+
+@pytest.mark.parametrize("mode", INFERENCE_MODES)
+def test_server_modes_are_kept(mode, capsys):
+    assert supported_mode(mode) == mode
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("mode", ["compile", "int8-static", "onnx", "bogus"])
+def test_cli_only_modes_fall_back_to_eager_with_a_warning(mode, capsys):
+    assert supported_mode(mode) == "eager"
+    assert f"INFERENCE_MODE {mode!r}" in capsys.readouterr().out
+
+
+def test_service_reports_the_mode_it_will_load():
+    service = InferenceService(mode="onnx")
+    assert service.mode == "eager"
+    assert service.status()["mode"] == "eager"
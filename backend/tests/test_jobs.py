@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import jobs, models
+
+
+@pytest.fixture
+def video(db, catalog_rows):
+    started = datetime(2024, 1, 1)
+    attempt = models.Attempt(
+        task_id=catalog_rows.task.id,
+        standard_id=catalog_rows.easy.id,
+        started_at=started,
+        ended_at=started + timedelta(seconds=50),
+        time_seconds=50,
+        score=80,
+        proficiency=False,
+    )
+    db.add(attempt)
+    db.flush()
+    video = models.Video(attempt_id=attempt.id, storage_url="/tmp/none.mp4")
+    db.add(video)
+    db.commit()
+    return video
+
+
+def _queue(db, video, count=1, **values):
+    rows = []
+    for i in range(count):
+        other = video if i == 0 else models.Video(attempt_id=video.attempt_id, storage_url=f"/tmp/{i}.mp4")
+        db.add(other)
+        db.flush()
+        job = jobs.new_job(video.attempt_id, other.id)
+        for name, value in values.items():
+            setattr(job, name, value)
+        rows.append(job)
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def _expire_lease(db, job):
+    job.locked_at = datetime.utcnow() - timedelta(seconds=jobs.ANALYSIS_LEASE_SECONDS + 1)
+    db.commit()
+
+
+def test_claim_leases_each_job_to_one_worker(db, video):
+    _queue(db, video, count=2)
+
+    first = jobs.claim_jobs(db, "a")
+    second = jobs.claim_jobs(db, "b")
+
+    assert [j.locked_by for j in first + second] == ["a", "b"]
+    assert {j.id for j in first}.isdisjoint(j.id for j in second)
+    assert all(j.status == "running" and j.attempts == 1 for j in first + second)
+    assert jobs.claim_jobs(db, "c") == []
+
+
+def test_expired_lease_is_reclaimed_while_attempts_remain(db, video):
+    (job,) = _queue(db, video, max_attempts=2)
+    (claimed,) = jobs.claim_jobs(db, "a")
+    _expire_lease(db, claimed)
+
+    (reclaimed,) = jobs.claim_jobs(db, "b")
+
+    assert reclaimed.id == job.id
+    assert reclaimed.locked_by == "b"
+    assert reclaimed.attempts == 2
+    # The first worker lost its lease, so its result is discarded.
+    assert not jobs.complete_job(db, reclaimed, "a", 1, {})
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(db, video):
+    (job,) = _queue(db, video, max_attempts=1)
+    (claimed,) = jobs.claim_jobs(db, "a")
+    _expire_lease(db, claimed)
+
+    assert jobs.claim_jobs(db, "b") == []
+
+    db.expire_all()
+    job = db.get(models.AnalysisJob, job.id)
+    assert job.status == "failed"
+    assert job.attempts == 1
+    assert job.locked_by is None
+    assert "Lease expired" in job.last_error
+
+
+def test_fail_job_backs_off_then_gives_up(db, video):
+    _queue(db, video, max_attempts=2)
+    (job,) = jobs.claim_jobs(db, "a")
+    assert jobs.fail_job(db, job, "a", "boom")
+    db.refresh(job)
+    assert job.status == "queued" and job.run_after > datetime.utcnow()
+    assert jobs.claim_jobs(db, "a") == []
+
+    job.run_after = datetime.utcnow()
+    db.commit()
+    (job,) = jobs.claim_jobs(db, "a")
+    assert jobs.fail_job(db, job, "a", "boom again")
+    db.refresh(job)
+    assert job.status == "failed" and job.last_error == "boom again"
+
+
+def test_max_running_caps_claims(db, video, monkeypatch):
+    monkeypatch.setattr(jobs, "ANALYSIS_MAX_RUNNING", 2)
+    _queue(db, video, count=4)
+
+    assert len(jobs.claim_jobs(db, "a", limit=3)) == 2
+    assert jobs.claim_jobs(db, "b") == []
@@ -0,0 +1,13 @@
+from conftest import auth_headers
+
+
+def test_routes_are_labelled_with_their_full_template(client, catalog_rows):
+    headers = auth_headers(client, "a@example.com")
+    client.get("/tasks/suturing", headers=headers)
+    client.get("/no/such/path")
+
+    body = client.get("/metrics").text
+    assert 'route="/auth/login"' in body
+    assert 'route="/tasks/{slug}"' in body
+    assert 'route="<unmatched>"' in body
+
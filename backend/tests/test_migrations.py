@@ -0,0 +1,41 @@
+from sqlalchemy import inspect, text
+
+from app.db import engine
+from app.migrations import create_missing_indexes
+
+
+def _index_names(table):
+    return {ix["name"] for ix in inspect(engine).get_indexes(table)}
+
+
+def test_replaces_superseded_leaderboard_indexes(db):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_best_attempts_leaderboard"))
+        conn.execute(text("DROP INDEX ix_best_attempts_task_leaderboard"))
+        conn.execute(text("CREATE INDEX ix_best_attempts_rank ON best_attempts (score DESC, time_seconds)"))
+        conn.execute(
+            text("CREATE INDEX ix_best_attempts_task_rank ON best_attempts (task_id, score DESC, time_seconds)")
+        )
+
+    created = create_missing_indexes(engine, log=lambda message: None)
+
+    assert set(created) == {"ix_best_attempts_leaderboard", "ix_best_attempts_task_leaderboard"}
+    names = _index_names("best_attempts")
+    assert {"ix_best_attempts_leaderboard", "ix_best_attempts_task_leaderboard"} <= names
+    assert not names & {"ix_best_attempts_rank", "ix_best_attempts_task_rank"}
+    assert create_missing_indexes(engine, log=lambda message: None) == []
+
+
+def test_leaderboard_order_is_served_by_the_index(db):
+    with engine.connect() as conn:
+        plan = " ".join(
+            str(row[-1])
+            for row in conn.execute(
+                text(
+                    "EXPLAIN QUERY PLAN SELECT * FROM best_attempts WHERE task_id = 1 "
+                    "ORDER BY score DESC, time_seconds, attempt_id LIMIT 10"
+                )
+            )
+        )
+    assert "ix_best_attempts_task_leaderboard" in plan
+    assert "TEMP B-TREE" not in plan
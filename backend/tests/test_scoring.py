@@ -0,0 +1,68 @@
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.scoring import score_attempt, score_attempts
+from conftest import attempt_payload, auth_headers
+
+
+def test_vectorized_scoring_matches_single_scoring():
+    cases = list(
+        itertools.product(
+            (0, 30, 60, 61, 100, 200),  # time_seconds
+            (60,),  # target
+            (0, 1),  # max minor
+            (0, 1),  # max major
+            (0, 1, 3),  # minor errors
+            (0, 1, 2),  # major errors
+            (0, 1),  # critical errors
+        )
+    )
+    columns = [np.array(column) for column in zip(*cases)]
+    scores, proficiency = score_attempts(*columns)
+
+    for i, (seconds, target, max_minor, max_major, minor, major, critical) in enumerate(cases):
+        standard = SimpleNamespace(target_time_seconds=target, max_minor_errors=max_minor, max_major_errors=max_major)
+        errors = [
+            SimpleNamespace(severity=severity)
+            for severity, count in (("minor", minor), ("major", major), ("critical", critical))
+            for _ in range(count)
+        ]
+        assert (scores[i], proficiency[i]) == score_attempt(seconds, standard, errors), cases[i]
+
+
+def test_batch_endpoint_scores_like_single_posts(client, catalog_rows):
+    task, easy, hard = catalog_rows.task.id, catalog_rows.easy.id, catalog_rows.hard.id
+    errors = catalog_rows.errors
+    payloads = [
+        attempt_payload(task, easy, 45),
+        attempt_payload(task, easy, 75, [errors["minor"].id], 2),
+        attempt_payload(task, hard, 30, [errors["major"].id, errors["minor"].id], 4),
+        attempt_payload(task, hard, 90, [errors["critical"].id], 6),
+        attempt_payload(task, easy, 60, [errors["minor"].id, errors["minor"].id], 8),
+    ]
+    fields = ("task_id", "standard_id", "time_seconds", "score", "proficiency")
+
+    single_headers = auth_headers(client, "single@example.com")
+    single = [client.post("/attempts/", json=payload, headers=single_headers).json() for payload in payloads]
+    batch = client.post(
+        "/attempts/batch", json={"attempts": payloads}, headers=auth_headers(client, "batch@example.com")
+    ).json()
+
+    assert batch["errors"] == []
+    assert [[row[f] for f in fields] for row in batch["created"]] == [[row[f] for f in fields] for row in single]
+
+
+def test_unknown_error_type_is_rejected_by_both_endpoints(client, catalog_rows):
+    headers = auth_headers(client, "a@example.com")
+    task, easy = catalog_rows.task.id, catalog_rows.easy.id
+    payload = attempt_payload(task, easy, 45, [catalog_rows.errors["minor"].id, 9999])
+
+    single = client.post("/attempts/", json=payload, headers=headers)
+    batch = client.post("/attempts/batch", json={"attempts": [payload]}, headers=headers).json()
+
+    assert (single.status_code, single.json()["detail"]) == (400, "Unknown error type")
+    assert batch["created"] == []
+    assert batch["errors"] == [{"index": 0, "detail": single.json()["detail"]}]
+    assert client.get("/attempts/me", headers=headers).json()["items"] == []
@@ -0,0 +1,79 @@
+import copy
+
+import pytest
+
+from app import bootstrap, models, rescoring, seed
+from conftest import attempt_payload, auth_headers
+
+
+@pytest.fixture
+def seeded(db, monkeypatch):
+    tasks = copy.deepcopy(seed.TASKS)
+    monkeypatch.setattr(seed, "TASKS", tasks)
+    seed.seed(force=True)
+    return tasks
+
+
+def _standard(db, slug):
+    db.expire_all()
+    return (
+        db.query(models.TaskStandard)
+        .join(models.Task, models.Task.id == models.TaskStandard.task_id)
+        .filter(models.Task.slug == slug)
+        .one()
+    )
+
+
+def test_streak_length_change_rebuilds_streaks_without_rescoring(client, db, seeded):
+    slug = seeded[0]["slug"]
+    standard = _standard(db, slug)
+    headers = auth_headers(client, "a@example.com")
+    for minute in range(2):
+        payload = attempt_payload(standard.task_id, standard.id, standard.target_time_seconds, start_minute=minute)
+        client.post("/attempts/", json=payload, headers=headers)
+
+    seeded[0]["standard"]["consecutive_required"] = 5
+    seed.seed()
+
+    db.expire_all()
+    assert db.query(models.RescoreJob).count() == 0
+    streak = db.query(models.ProficiencyStreak).filter_by(standard_id=standard.id).one()
+    assert (streak.consecutive_required, streak.current_run, streak.achieved_at) == (5, 2, None)
+
+
+def test_limit_change_queues_a_rescore(db, seeded):
+    standard = _standard(db, seeded[0]["slug"])
+    seeded[0]["standard"]["target_time_seconds"] += 10
+    seed.seed()
+
+    db.expire_all()
+    assert db.query(models.RescoreJob).one().standard_ids == [standard.id]
+
+
+def test_reseed_keeps_stored_values_for_keys_the_seed_omits(db, seeded):
+    slug = seeded[0]["slug"]
+    standard = _standard(db, slug)
+    standard.max_minor_errors = 4
+    standard.target_time_seconds = 999
+    db.commit()
+
+    del seeded[0]["standard"]["max_minor_errors"]
+    seed.seed(force=True)
+
+    standard = _standard(db, slug)
+    assert standard.max_minor_errors == 4
+    assert standard.target_time_seconds == seeded[0]["standard"]["target_time_seconds"]
+
+
+def test_bootstrap_leaves_the_rescore_queued(db, seeded):
+    seeded[0]["standard"]["target_time_seconds"] += 10
+    bootstrap.bootstrap()
+
+    db.expire_all()
+    assert db.query(models.RescoreJob).one().status == "pending"
+
+    with bootstrap.advisory_lock(rescoring.RESCORE_LOCK_KEY, "rescore"):
+        assert rescoring.run_pending_rescores(log=None) == 0
+    assert rescoring.run_pending_rescores(log=None) == 1
+    db.expire_all()
+    assert db.query(models.RescoreJob).one().status == "done"
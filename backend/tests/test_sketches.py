@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import models
+from app.sketches import (
+    SKETCH_RELATIVE_ACCURACY,
+    AttemptSketch,
+    LogSketch,
+    ScoreHistogram,
+    SketchStore,
+    load_sketches,
+    rebuild_sketches,
+)
+
+
+def _add_attempt(db, catalog_rows, standard, score, seconds, user_id=None):
+    started = datetime(2024, 1, 1)
+    attempt = models.Attempt(
+        user_id=user_id,
+        task_id=catalog_rows.task.id,
+        standard_id=standard.id if standard is not None else None,
+        started_at=started,
+        ended_at=started + timedelta(seconds=seconds),
+        time_seconds=seconds,
+        score=score,
+        proficiency=False,
+    )
+    db.add(attempt)
+    return attempt
+
+
+def test_score_histogram_matches_exact_ranks_and_quantiles():
+    scores = np.random.default_rng(1).integers(0, 101, 500)
+    histogram = ScoreHistogram()
+    for score in scores:
+        histogram.add(score)
+
+    for q in (0.0, 0.1, 0.5, 0.9, 1.0):
+        assert histogram.quantile(q) == np.quantile(scores, q, method="lower")
+    for score in (0, 37, 50, 100):
+        expected = ((scores < score).sum() + (scores == score).sum() / 2) / len(scores)
+        assert histogram.rank(score) == pytest.approx(expected)
+    assert ScoreHistogram().rank(50) is None
+
+
+def test_log_sketch_quantiles_within_relative_accuracy():
+    values = np.random.default_rng(2).lognormal(5, 1, 5000).round()
+    sketch = LogSketch()
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        exact = np.quantile(values, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= SKETCH_RELATIVE_ACCURACY * exact + 1e-9
+    ranks = [sketch.rank(value) for value in (10, 100, 1000, 10000)]
+    assert ranks == sorted(ranks)
+    assert sketch.rank(values.max() * 2) == pytest.approx(1.0)
+
+
+def test_sketches_merge_like_a_single_sketch():
+    rng = np.random.default_rng(3)
+    rows = [(int(rng.integers(0, 101)), int(rng.integers(0, 600))) for _ in range(300)]
+    whole, left, right = AttemptSketch(), AttemptSketch(), AttemptSketch()
+    for i, (score, seconds) in enumerate(rows):
+        whole.add(score, seconds)
+        (left if i % 2 else right).add(score, seconds)
+    left.merge(right)
+    assert left.to_row() == whole.to_row()
+
+
+def test_rebuild_skips_attempts_whose_standard_was_deleted(db, catalog_rows):
+    _add_attempt(db, catalog_rows, catalog_rows.easy, 80, 50)
+    _add_attempt(db, catalog_rows, None, 70, 90)
+    db.commit()
+
+    rebuild_sketches(db)
+    db.commit()
+
+    sketches, _ = load_sketches(db)
+    assert list(sketches) == [(catalog_rows.task.id, catalog_rows.easy.id)]
+    assert sketches[(catalog_rows.task.id, catalog_rows.easy.id)].count == 1
+
+
+def test_sync_drops_deltas_already_counted_by_a_rebuild(db, catalog_rows):
+    store = SketchStore()
+    key = (catalog_rows.task.id, catalog_rows.easy.id)
+    before = _add_attempt(db, catalog_rows, catalog_rows.easy, 80, 50)
+    db.commit()
+    store.record(*key, 80, 50, before.created_at)
+
+    # A rescore rebuilds the sketches before this worker flushes its delta.
+    rebuild_sketches(db)
+    db.commit()
+    after = _add_attempt(db, catalog_rows, catalog_rows.easy, 60, 70)
+    db.commit()
+    store.record(*key, 60, 70, after.created_at)  # created after the rebuild, so not in it
+    store.sync()
+
+    db.expire_all()
+    sketches, _ = load_sketches(db)
+    assert sketches[key].count == 2
+    assert store.get(*key).count == 2
+
+
+def test_attempt_created_before_a_rebuild_but_recorded_after_counts_once(db, catalog_rows):
+    store = SketchStore()
+    key = (catalog_rows.task.id, catalog_rows.easy.id)
+    attempt = _add_attempt(db, catalog_rows, catalog_rows.easy, 80, 50)
+    db.commit()
+
+    # The rebuild reads the committed attempt before its request reaches record().
+    rebuild_sketches(db)
+    db.commit()
+    store.record(*key, 80, 50, attempt.created_at)
+    store.sync()
+
+    assert store.get(*key).count == 1
+
+
+def test_rebuild_leaves_attempts_created_after_its_stamp_to_the_workers(db, catalog_rows):
+    key = (catalog_rows.task.id, catalog_rows.easy.id)
+    attempt = _add_attempt(db, catalog_rows, catalog_rows.easy, 80, 50)
+    attempt.created_at = datetime.utcnow() + timedelta(minutes=1)
+    db.commit()
+
+    rebuild_sketches(db)
+    db.commit()
+
+    sketches, _ = load_sketches(db)
+    assert key not in sketches
+
+
+def test_sync_drops_deltas_for_deleted_standards(db, catalog_rows):
+    store = SketchStore()
+    now = datetime.utcnow()
+    store.record(catalog_rows.task.id, catalog_rows.easy.id, 80, 50, now)
+    store.record(catalog_rows.task.id, catalog_rows.hard.id, 70, 60, now)
+    db.delete(catalog_rows.hard)
+    db.commit()
+
+    store.sync()
+
+    db.expire_all()
+    sketches, _ = load_sketches(db)
+    assert list(sketches) == [(catalog_rows.task.id, catalog_rows.easy.id)]
+    assert store._pending == {}
+    assert store.get(catalog_rows.task.id, catalog_rows.hard.id) is None
@@ -0,0 +1,56 @@
+from app import models
+from app.team_stats import median_time, rebuild_team_stats
+from conftest import attempt_payload, auth_headers, table_rows
+
+
+def _rollups(db):
+    return table_rows(db, models.TeamTaskStats), table_rows(db, models.TeamTaskTime)
+
+
+def _assert_matches_rebuild(db):
+    incremental = _rollups(db)
+    rebuild_team_stats(db)
+    db.commit()
+    assert _rollups(db) == incremental
+
+
+def _user_id(db, email):
+    return db.query(models.User.id).filter(models.User.email == email).scalar()
+
+
+def test_rollups_match_rebuild_through_attempts_and_membership_changes(client, db, catalog_rows):
+    admin = auth_headers(client, "admin@example.com")
+    residents = {email: auth_headers(client, email) for email in ("a@example.com", "b@example.com")}
+    red = client.post("/teams/", json={"name": "Red"}, headers=admin).json()["id"]
+    blue = client.post("/teams/", json={"name": "Blue"}, headers=admin).json()["id"]
+    task, easy, hard = catalog_rows.task.id, catalog_rows.easy.id, catalog_rows.hard.id
+    minor = catalog_rows.errors["minor"].id
+
+    # History recorded before anyone joins a team.
+    client.post("/attempts/", json=attempt_payload(task, easy, 50), headers=residents["a@example.com"])
+    client.put(f"/teams/{red}/members/{_user_id(db, 'a@example.com')}", headers=admin)
+    client.put(f"/teams/{blue}/members/{_user_id(db, 'a@example.com')}", headers=admin)
+    client.put(f"/teams/{red}/members/{_user_id(db, 'b@example.com')}", headers=admin)
+    # Adding an existing member again must not count their history twice.
+    client.put(f"/teams/{red}/members/{_user_id(db, 'a@example.com')}", headers=admin)
+    _assert_matches_rebuild(db)
+
+    client.post("/attempts/", json=attempt_payload(task, hard, 70, [minor], 2), headers=residents["a@example.com"])
+    batch = [attempt_payload(task, easy, seconds, start_minute=minute) for minute, seconds in enumerate((40, 50, 90))]
+    assert client.post("/attempts/batch", json={"attempts": batch}, headers=residents["b@example.com"]).status_code == 201
+    _assert_matches_rebuild(db)
+
+    assert client.delete(f"/teams/{red}/members/{_user_id(db, 'a@example.com')}", headers=admin).status_code == 204
+    assert client.delete(f"/teams/{red}/members/{_user_id(db, 'a@example.com')}", headers=admin).status_code == 404
+    _assert_matches_rebuild(db)
+
+    summary = client.get(f"/teams/{red}/summary").json()
+    assert summary["tasks"][0]["attempts"] == 3
+    assert summary["tasks"][0]["median_time_seconds"] == 50
+
+
+def test_median_time_of_histogram():
+    assert median_time([]) is None
+    assert median_time([(30, 1), (50, 1)]) == 40
+    assert median_time([(30, 2), (50, 1)]) == 30
+    assert median_time([(10, 1), (20, 2), (90, 1)]) == 20
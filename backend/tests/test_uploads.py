@@ -0,0 +1,113 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+from app.routes import videos
+from conftest import attempt_payload, auth_headers
+
+TUS = {"Tus-Resumable": "1.0.0", "Content-Type": videos.TUS_CONTENT_TYPE}
+
+
+@pytest.fixture
+def upload(client, catalog_rows):
+    headers = auth_headers(client, "resident@example.com")
+    attempt = client.post(
+        "/attempts/", json=attempt_payload(catalog_rows.task.id, catalog_rows.easy.id, 50), headers=headers
+    ).json()
+    created = client.post(
+        f"/attempts/{attempt['id']}/video/uploads",
+        params={"filename": "clip.mp4"},
+        headers={**headers, "Upload-Length": "10"},
+    )
+    assert created.status_code == 201
+    return created.headers["Location"], headers
+
+
+def _patch(client, location, headers, offset, body):
+    return client.patch(location, content=body, headers={**headers, **TUS, "Upload-Offset": str(offset)})
+
+
+def _row(db, location):
+    db.expire_all()
+    return db.get(models.VideoUpload, location.rsplit("/", 1)[1])
+
+
+def test_upload_resumes_from_the_reported_offset(client, db, upload):
+    location, headers = upload
+
+    assert _patch(client, location, headers, 0, b"01234").headers["Upload-Offset"] == "5"
+    assert client.head(location, headers=headers).headers["Upload-Offset"] == "5"
+    assert _patch(client, location, headers, 0, b"xxxxx").status_code == 409
+
+    done = _patch(client, location, headers, 5, b"56789")
+    assert done.status_code == 204
+    assert done.headers["Upload-Checksum"] == f"sha256 {hashlib.sha256(b'0123456789').hexdigest()}"
+    row = _row(db, location)
+    assert row.video_id is not None and row.lock_token is None
+    with open(row.storage_path, "rb") as f:
+        assert f.read() == b"0123456789"
+    assert _patch(client, location, headers, 10, b"").status_code == 409
+
+
+def test_concurrent_patch_is_locked_out_until_the_lease_expires(client, db, upload):
+    location, headers = upload
+    row = _row(db, location)
+    row.lock_token = "someone-else"
+    row.updated_at = datetime.utcnow()
+    db.commit()
+
+    assert _patch(client, location, headers, 0, b"01234").status_code == 423
+
+    row.updated_at = datetime.utcnow() - timedelta(seconds=videos.UPLOAD_LEASE_SECONDS + 1)
+    db.commit()
+    assert _patch(client, location, headers, 0, b"01234").headers["Upload-Offset"] == "5"
+
+
+def test_lost_partial_file_restarts_the_upload(client, db, upload):
+    location, headers = upload
+    _patch(client, location, headers, 0, b"01234")
+    os.remove(_row(db, location).storage_path)
+
+    response = _patch(client, location, headers, 5, b"56789")
+
+    assert response.status_code == 409
+    assert client.head(location, headers=headers).headers["Upload-Offset"] == "0"
+    assert not os.path.exists(_row(db, location).storage_path)
+    assert _patch(client, location, headers, 0, b"0123456789").status_code == 204
+
+
+@pytest.fixture
+def video(client, db, upload):
+    location, headers = upload
+    assert _patch(client, location, headers, 0, b"0123456789").status_code == 204
+    row = _row(db, location)
+    return f"/attempts/{row.attempt_id}/video/{row.video_id}", headers
+
+
+def test_video_serves_byte_ranges(client, video):
+    url, headers = video
+
+    whole = client.get(url, headers={**headers, "Range": "bytes=0-9"})
+    assert whole.status_code == 206
+    assert whole.headers["Content-Range"] == "bytes 0-9/10"
+    assert whole.content == b"0123456789"
+
+    part = client.get(url, headers={**headers, "Range": "bytes=2-5"})
+    assert part.status_code == 206
+    assert part.headers["Content-Range"] == "bytes 2-5/10"
+    assert part.content == b"2345"
+
+    full = client.get(url, headers=headers)
+    assert full.status_code == 200 and full.headers["Accept-Ranges"] == "bytes"
+    assert client.get(url, headers={**headers, "If-None-Match": full.headers["etag"]}).status_code == 304
+
+
+def test_video_is_hidden_from_other_users(client, video):
+    url, _ = video
+    other = auth_headers(client, "other@example.com")
+    assert client.get(url, headers={**other, "Range": "bytes=0-9"}).status_code == 404
+    assert client.head(url, headers=other).status_code == 404
+    assert client.get(url).status_code == 401